@@ -7,6 +7,7 @@ from fmdt.core import (
 
 from fmdt.api import (
     detect,
+    detect_many,
     log_parser,
     visu,
     count,
@@ -14,6 +15,10 @@ from fmdt.api import (
     check
 )
 
+from fmdt.sched import (
+    Scheduler
+)
+
 from fmdt.args import (
     Args,
     DetectArgs,
@@ -57,6 +62,7 @@ from fmdt.config import (
     setdir_window,
     init_cache,
     clear_cache,
+    set_cache_limits,
     cache_dir,
     cache_info,
     listdir_cache,
@@ -94,6 +100,10 @@ from fmdt.res import (
     retrieve_log_df
 )
 
+import fmdt.aio
+import fmdt.sweep
+import fmdt.search
+
 init_cache()
 
 
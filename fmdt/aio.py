@@ -0,0 +1,513 @@
+"""
+asyncio API to call fmdt executables. Mirrors fmdt.api, but every wrapper is a coroutine built on
+`asyncio.create_subprocess_exec` so that many executions can be driven from a single event loop.
+
+Cancelling a task (or exceeding its timeout) kills the underlying process. The number of processes
+running at the same time is bounded by a semaphore, see `set_max_concurrency`.
+"""
+import os
+import asyncio
+import contextlib
+import weakref
+import fmdt.api
+import fmdt.args
+import fmdt.core
+import fmdt.res
+import fmdt.cache
+import fmdt.utils
+import shutil
+import tempfile
+import time
+from termcolor import colored
+
+def help():
+    s = """    fmdt.aio contains asyncio counterparts of the wrappers in fmdt.api:
+        fmdt.aio.detect
+        fmdt.aio.log_parser
+        fmdt.aio.visu
+        fmdt.aio.check
+
+    fmdt.aio.set_max_concurrency sets the number of executables allowed to run at the same time
+    """
+    return s
+
+_MAX_CONCURRENCY = os.cpu_count() or 1
+
+# asyncio primitives are bound to the loop they are first used in, so keep one semaphore per loop
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+def set_max_concurrency(n: int) -> None:
+    """Set the maximum number of fmdt executables that fmdt.aio runs at the same time. Default os.cpu_count()
+
+    Only applies to event loops that haven't called an fmdt.aio function yet.
+    """
+    global _MAX_CONCURRENCY
+
+    assert n > 0, "fmdt.aio needs to run at least one process at a time"
+
+    _MAX_CONCURRENCY = n
+    _SEMAPHORES.clear()
+
+def get_max_concurrency() -> int:
+    return _MAX_CONCURRENCY
+
+def _semaphore() -> asyncio.Semaphore:
+
+    loop = asyncio.get_running_loop()
+
+    if not loop in _SEMAPHORES:
+        _SEMAPHORES[loop] = asyncio.Semaphore(_MAX_CONCURRENCY)
+
+    return _SEMAPHORES[loop]
+
+async def detect(
+        #=================== fmdt-detect parameters ================
+        vid_in_path: str,
+        vid_in_start: int | None = None,
+        vid_in_stop: int | None = None,
+        vid_in_skip: int | None = None,
+        vid_in_buff: bool | None = None,
+        vid_in_loop: int | None = None,
+        vid_in_threads: int | None = None,
+        ccl_hyst_lo: int | None = None,
+        ccl_hyst_hi: int | None = None,
+        ccl_fra_path: str | None = None,
+        ccl_fra_id: bool | None = None,
+        cca_mag: bool | None = None,
+        cca_ell: bool | None = None,
+        mrp_s_min: int | None = None,
+        mrp_s_max: int | None = None,
+        knn_k: int | None = None,
+        knn_d: int | None = None,
+        knn_s: int | None = None,
+        trk_ext_d: int | None = None,
+        trk_ext_o: int | None = None,
+        trk_angle: float | None = None,
+        trk_star_min: int | None = None,
+        trk_meteor_min: int | None = None,
+        trk_meteor_max: int | None = None,
+        trk_ddev: float | None = None,
+        trk_all: bool | None = None,
+        trk_roi_path: str | None = None,
+        log_path: str | None = None,
+        #================== Additional Parameters ====================
+        trk_path: str | None = None,
+        verbose: bool = False,
+        timeout: float = None,
+        cache: bool = False,
+        save_df: bool = False,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+    """Coroutine version of fmdt.detect, takes the same parameters.
+
+    Examples
+    --------
+    >>> res = await fmdt.aio.detect(vid_in_path="demo.mp4", timeout=10)
+    >>> results = await asyncio.gather(*[fmdt.aio.detect(vid_in_path=v) for v in videos])
+    """
+
+    assert os.path.exists(vid_in_path), f"vid_in_path: '{vid_in_path}' does not exists, aborting fmdt.aio.detect"
+
+    args = fmdt.args.detect_args(vid_in_path=vid_in_path,
+                                 vid_in_start=vid_in_start,
+                                 vid_in_stop=vid_in_stop,
+                                 vid_in_skip=vid_in_skip,
+                                 vid_in_buff=vid_in_buff,
+                                 vid_in_loop=vid_in_loop,
+                                 vid_in_threads=vid_in_threads,
+                                 ccl_hyst_lo=ccl_hyst_lo,
+                                 ccl_hyst_hi=ccl_hyst_hi,
+                                 ccl_fra_path=ccl_fra_path,
+                                 ccl_fra_id=ccl_fra_id,
+                                 cca_mag=cca_mag,
+                                 cca_ell=cca_ell,
+                                 mrp_s_min=mrp_s_min,
+                                 mrp_s_max=mrp_s_max,
+                                 knn_k=knn_k,
+                                 knn_d=knn_d,
+                                 knn_s=knn_s,
+                                 trk_ext_d=trk_ext_d,
+                                 trk_ext_o=trk_ext_o,
+                                 trk_angle=trk_angle,
+                                 trk_star_min=trk_star_min,
+                                 trk_meteor_min=trk_meteor_min,
+                                 trk_meteor_max=trk_meteor_max,
+                                 trk_ddev=trk_ddev,
+                                 trk_all=trk_all,
+                                 trk_roi_path=trk_roi_path,
+                                 log_path=log_path,
+                                 trk_path=trk_path,
+                                 verbose=verbose)
+
+    # Identical detections share a single execution, including with the callers of fmdt.api.detect.
+    # The key fingerprints the video, keep it off the event loop
+    key = await asyncio.to_thread(fmdt.api._flight_key, args, timeout, cache, save_df)
+    res, shared = await _single_flight(key, lambda: _detect(args, timeout, verbose, cache, save_df, on_track))
+
+    if shared:
+        return await asyncio.to_thread(fmdt.api._shared_result, res, args, on_track)
+
+    return res
+
+async def _detect(
+        args: fmdt.args.Args,
+        timeout: float | None,
+        verbose: bool,
+        cache: bool,
+        save_df: bool,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+    """Coroutine version of fmdt.api._detect"""
+
+    if not cache:
+        return await _execute_detect(args, timeout, verbose, cache, save_df, on_track)
+
+    async with _cache_lock(args.detect_args.cache_key()):
+        return await _execute_detect(args, timeout, verbose, cache, save_df, on_track)
+
+async def _execute_detect(
+        args: fmdt.args.Args,
+        timeout: float | None,
+        verbose: bool,
+        cache: bool,
+        save_df: bool,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+    """Coroutine version of fmdt.api._execute_detect"""
+
+    log_in_cache = save_df and args.detect_args.log_path is None
+
+    # Fingerprinting the video and clearing log files touch the disk, keep them off the event loop
+    cached = await asyncio.to_thread(fmdt.api._setup_detect, args, cache, save_df, verbose)
+
+    if not cached is None:
+        return cached
+
+    argv = args.detect_args.argv()
+    cache_trk = args.detect_args.cache_trk() if cache else None
+
+    if args.trk_path() is None:
+        run = await _run_detect(args.gen_unique_trk(), argv, timeout, verbose, cache, cache_trk, tmp_file=True, on_track=on_track)
+    else:
+        run = await _run_detect(args.trk_path(), argv, timeout, verbose, cache, cache_trk, on_track=on_track)
+
+    return await asyncio.to_thread(fmdt.api._detect_result, args, run, cache, log_in_cache)
+
+async def _single_flight(key: tuple, run) -> tuple[fmdt.res.DetectionResult, bool]:
+    """Coroutine version of fmdt.api._single_flight, where `run` returns a coroutine.
+
+    Flights are shared with fmdt.api: a follower waits without holding a thread, whether the leader
+    is a task of any event loop or a thread calling fmdt.api.detect.
+    """
+
+    flight, leader = fmdt.api._join_flight(key)
+
+    if not leader:
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        flight.add_done_callback(lambda: _wake(loop, done))
+        await done
+
+        if not flight.error is None:
+            raise flight.error
+
+        return flight.result, True
+
+    try:
+        flight.result = await run()
+    except BaseException as err:
+        flight.error = err
+        raise
+    finally:
+        fmdt.api._land_flight(key, flight)
+
+    return flight.result, False
+
+def _wake(loop: asyncio.AbstractEventLoop, done: asyncio.Future) -> None:
+    """Resolve `done` from any thread, unless its waiter is gone"""
+
+    def resolve():
+        if not done.done():
+            done.set_result(None)
+
+    # The loop may be closed when its follower was cancelled
+    with contextlib.suppress(RuntimeError):
+        loop.call_soon_threadsafe(resolve)
+
+@contextlib.asynccontextmanager
+async def _cache_lock(key: str):
+    """fmdt.cache.lock, waited for in a worker thread"""
+
+    lock = fmdt.cache.lock(key)
+    acquire = asyncio.ensure_future(asyncio.to_thread(lock.__enter__))
+
+    try:
+        await asyncio.shield(acquire)
+    except asyncio.CancelledError:
+        # The thread gets the lock anyway, release it as soon as it does
+        acquire.add_done_callback(lambda f: f.cancelled() or not f.exception() is None or lock.__exit__(None, None, None))
+        raise
+
+    try:
+        yield
+    finally:
+        lock.__exit__(None, None, None)
+
+async def log_parser(
+        log_path: str,
+        trk_roi_path: str | None = None,
+        log_flt: str | None = None,
+        fra_path: str | None = None,
+        ftr_name: str | None = None,
+        ftr_path: str | None = None,
+        trk_path: str | None = None,
+        trk_json_path: str | None = None,
+        trk_bb_path: str | None = None,
+        #========================== Additional Options ========================
+        stdout: str | None = None,
+        verbose: bool = False,
+        timeout: float | None = None
+    ) -> fmdt.res.LogParserResult:
+    """Coroutine version of fmdt.log_parser, takes the same parameters.
+
+    timeout (float): Number of seconds after which `fmdt-log-parser` is killed. Default None
+    """
+    log_parser_args = fmdt.args.log_parser_args(log_path=log_path,
+                                                trk_roi_path=trk_roi_path,
+                                                log_flt=log_flt,
+                                                fra_path=fra_path,
+                                                ftr_name=ftr_name,
+                                                ftr_path=ftr_path,
+                                                trk_path=trk_path,
+                                                trk_json_path=trk_json_path,
+                                                trk_bb_path=trk_bb_path)
+
+    argv = fmdt.args.handle_log_parser_args(**log_parser_args.to_dict())
+
+    if stdout is None:
+        stdout = log_parser_args.gen_unique_file(prefix="log_parser_")
+        usage = await _run_process(stdout, argv, verbose, timeout, tmp_file=True)
+    else:
+        usage = await _run_process(stdout, argv, verbose, timeout)
+
+    args = fmdt.args.Args(log_parser_args=log_parser_args, detect_args=None, visu_args=None, verbose=verbose)
+
+    return fmdt.res.LogParserResult(args, usage)
+
+async def visu(
+        vid_in_path: str,
+        trk_path: str,
+        trk_bb_path: str,
+        vid_out_path: str,
+        vid_in_start: int | None = None,
+        vid_in_stop: int | None = None,
+        vid_in_threads: int | None = None,
+        trk_id: bool | None = None,
+        trk_nat_num: bool | None = None,
+        trk_only_meteor: bool | None = None,
+        gt_path: str | None = None,
+        #========================== Additional Options ========================
+        verbose: bool = False,
+        stdout: str | None = None,
+        timeout: float | None = None
+    ) -> fmdt.res.VisuResult:
+    """Coroutine version of fmdt.visu, takes the same parameters.
+
+    timeout (float): Number of seconds after which `fmdt-visu` is killed. Default None
+    """
+    visu_args = fmdt.args.visu_args(vid_in_path=vid_in_path,
+                                    vid_in_start=vid_in_start,
+                                    vid_in_stop=vid_in_stop,
+                                    vid_in_threads=vid_in_threads,
+                                    trk_path=trk_path,
+                                    trk_bb_path=trk_bb_path,
+                                    trk_id=trk_id,
+                                    trk_nat_num=trk_nat_num,
+                                    trk_only_meteor=trk_only_meteor,
+                                    gt_path=gt_path,
+                                    vid_out_path=vid_out_path)
+
+    argv = fmdt.args.handle_visu_args(**visu_args.to_dict())
+
+    if stdout is None:
+        stdout = visu_args.gen_unique_file(prefix="visu_")
+        usage = await _run_process(stdout, argv, verbose, timeout, tmp_file=True)
+    else:
+        usage = await _run_process(stdout, argv, verbose, timeout)
+
+    args = fmdt.args.Args(visu_args=visu_args, detect_args=None, log_parser_args=None)
+
+    return fmdt.res.VisuResult(args, usage)
+
+async def check(
+        trk_path: str,
+        gt_path: str,
+        stdout: str | None = None,
+        verbose = False,
+        args = None,
+        timeout: float | None = None
+    ) -> fmdt.res.CheckResult:
+    """Coroutine version of fmdt.check
+
+    Parameters
+    ----------
+    stdout (str): File to store stdout of fmdt-check. When None, a temporary file is used
+    timeout (float): Number of seconds after which `fmdt-check` is killed. Default None
+    """
+
+    argv = fmdt.args.handle_check_args(trk_path, gt_path)
+    tmp_file = stdout is None
+
+    if tmp_file:
+        fd, stdout = tempfile.mkstemp(prefix="check_", suffix=".txt", dir=".")
+        os.close(fd)
+
+    try:
+        usage = await _run_process(stdout, argv, verbose, timeout)
+
+        stats = fmdt.res.load_check_stats(stdout)
+        gt_table = fmdt.res.load_check_gt_table(stdout)
+    finally:
+        if tmp_file and os.path.exists(stdout):
+            os.remove(stdout)
+
+    return fmdt.res.CheckResult(gt_table=gt_table, stats=stats, args=args, usage=usage)
+
+# ===================== _run_$EXECUTABLE ======================================
+async def _run_detect(
+        trk_path: str,
+        argv: list[str],
+        timeout: float,
+        verbose: bool,
+        cache: bool,
+        cache_file: str,
+        tmp_file: bool = False,
+        on_track = None
+    ) -> tuple[list[fmdt.core.TrackedObject], int, fmdt.res.RunStatus, int, fmdt.res.ResourceUsage]:
+    """Coroutine version of fmdt.api._run_detect"""
+
+    if verbose:
+        print(f"Executing cmd: {' '.join(argv)}")
+
+    parser = fmdt.core.TrackParser(on_track)
+
+    try:
+        with open(trk_path, 'w', encoding="utf-8") as outfile:
+            returncode, timed_out, usage = await _stream_process(argv, outfile, timeout, verbose, parser.feed)
+    except asyncio.CancelledError:
+        if tmp_file and os.path.exists(trk_path):
+            os.remove(trk_path)
+        raise
+
+    usage.nframes = parser.nframes
+    status = fmdt.api._run_status(returncode, timed_out)
+
+    if status == fmdt.res.RunStatus.TIMEOUT:
+        fmdt.api._print_timeout(argv, timeout, len(parser.trk_list))
+    elif status == fmdt.res.RunStatus.FAILED:
+        fmdt.utils.stderr(f"fmdt-detect exited with code {returncode} for \n\t{' '.join(argv)}")
+
+    if cache and status == fmdt.res.RunStatus.OK:
+        shutil.copyfile(src=trk_path, dst=cache_file)
+        await asyncio.to_thread(fmdt.cache.register, cache_file)
+
+    if tmp_file:
+        os.remove(trk_path)
+
+    return parser.trk_list, parser.nframes, status, returncode, usage
+
+async def _run_process(
+        stdout_file: str,
+        argv: list[str],
+        verbose: bool,
+        timeout: float | None,
+        tmp_file: bool = False
+    ) -> fmdt.res.ResourceUsage:
+    """Coroutine version of fmdt.api._run_process"""
+
+    if verbose:
+        print(f"Executing cmd: {' '.join(argv)}")
+
+    try:
+        with open(stdout_file, 'w', encoding="utf-8") as outfile:
+            _, timed_out, usage = await _stream_process(argv, outfile, timeout, verbose)
+    finally:
+        if tmp_file and os.path.exists(stdout_file):
+            os.remove(stdout_file)
+
+    if timed_out:
+        print(f"Subprocess timed out for \n\t{colored(' '.join(argv), 'blue')}")
+
+    return usage
+
+async def _stream_process(
+        argv: list[str],
+        outfile,
+        timeout: float | None,
+        verbose: bool,
+        on_line = None
+    ) -> tuple[int, bool, fmdt.res.ResourceUsage]:
+    """Execute `argv` once a slot of the concurrency limit is free, copying each line of its stdout
+    to `outfile` as soon as it is produced.
+
+    When `timeout` expires the process is terminated, then killed if it is still running after
+    fmdt.api.TERMINATE_GRACE seconds. When the calling task is cancelled the process is killed and
+    CancelledError is propagated.
+
+    Return
+    ------
+    (returncode, timed_out, usage): The exit code of the process, whether it was stopped because it exceeded
+        `timeout` and its ResourceUsage. The event loop reaps its children itself, so only the wall-clock
+        time is available.
+    """
+
+    async with _semaphore():
+
+        start = time.monotonic()
+        proc = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.PIPE)
+
+        async def pump():
+            async for raw in proc.stdout:
+                line = raw.decode("utf-8", errors="replace")
+                outfile.write(line)
+
+                if verbose:
+                    print(line, end="")
+
+                if not on_line is None:
+                    on_line(line)
+
+            await proc.wait()
+
+        pump_task = asyncio.ensure_future(pump())
+        timed_out = False
+
+        try:
+            done, _ = await asyncio.wait([pump_task], timeout=timeout)
+
+            if pump_task in done:
+                pump_task.result()
+            else:
+                timed_out = True
+
+                # The process may exit right before being signaled
+                with contextlib.suppress(ProcessLookupError):
+                    proc.terminate()
+
+                # Keep reading what the process prints while it shuts down
+                await asyncio.wait([pump_task], timeout=fmdt.api.TERMINATE_GRACE)
+        finally:
+            if proc.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+
+                # Reap the child even if we are being cancelled
+                await asyncio.shield(proc.wait())
+
+            if not pump_task.done():
+                pump_task.cancel()
+
+                with contextlib.suppress(asyncio.CancelledError):
+                    await pump_task
+
+    return proc.returncode, timed_out, fmdt.res.ResourceUsage(time.monotonic() - start)
@@ -9,10 +9,23 @@ import os
 import fmdt.core
 import fmdt.utils
 import fmdt.args
+import fmdt.cache
+import fmdt.sched
 from termcolor import colored
 import shutil
+import copy
+import csv
+import threading
+import time
+import sys
+import signal
 import pandas as pd
 
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    as_completed
+)
+
 def help():
     s = """    fmdt.api contains a Python wrapper for the `fmdt-detect` and `fmdt-visu`
     executables.
@@ -20,11 +33,13 @@ def help():
     fmdt.api contains the public-facing functions (also aliased under fmdt.*):
         fmdt[.api].count
         fmdt[.api].detect
+        fmdt[.api].detect_many
         fmdt[.api].log_parser
         fmdt[.api].visu
 
     fmdt.api.count counts the number of celestial objects specified by the parameters
     fmdt.api.detect calls `fmdt-detect` with the given arguments
+    fmdt.api.detect_many calls `fmdt-detect` for a list of DetectArgs using a pool of workers
     fmdt.api.log_parser calls `fmdt-log-parser`
     fmdt.api.visu calls `fmdt-visu`
     """
@@ -78,6 +93,9 @@ def count(
 
 FMDT_TIMEOUT = 1
 
+# Seconds a timed out process is given to exit after being terminated, before it is killed
+TERMINATE_GRACE = 2
+
 
 def detect(
         #=================== fmdt-detect parameters ================
@@ -114,7 +132,8 @@ def detect(
         verbose: bool = False,
         timeout: float = None,
         cache: bool = False,
-        save_df: bool = False
+        save_df: bool = False,
+        on_track = None
     ) -> fmdt.res.DetectionResult:
     """Wrapper to executable fmdt-detect.
 
@@ -128,6 +147,12 @@ def detect(
     verbose (bool): Print logging messages to stdout (True) or do nothing (False). Default False.
     timeout (float): timeout in seconds of the Python subprocess executing `fmdt-detect`. Default None.
         Used to speed up ground truth testing.
+    cache (bool): When True, reuse the tracks (and dataframe when `save_df=True`) cached by a previous call
+        with the same parameters instead of executing `fmdt-detect`. New results are stored in the cache.
+        Calls that specify a `log_path` always execute `fmdt-detect`.
+    save_df (bool): When True, store the movement statistics of the log files in the `df` field of the result.
+    on_track (Callable[[TrackedObject], None]): Called with each TrackedObject as soon as `fmdt-detect` prints it,
+        while the process is still running. Default None.
     """
 
     assert os.path.exists(vid_in_path), f"vid_in_path: '{vid_in_path}' does not exists, aborting fmdt.detect"
@@ -164,6 +189,203 @@ def detect(
                                  trk_path=trk_path,
                                  verbose=verbose)
 
+    # Identical detections requested at the same time by several threads share a single execution
+    key = _flight_key(args, timeout, cache, save_df)
+    res, shared = _single_flight(key, lambda: _detect(args, timeout, verbose, cache, save_df, on_track))
+
+    if shared:
+        return _shared_result(res, args, on_track)
+
+    return res
+
+def _detect(
+        args: fmdt.args.Args,
+        timeout: float | None,
+        verbose: bool,
+        cache: bool,
+        save_df: bool,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+    """Execute `fmdt-detect`, or load its result from the cache.
+
+    With the cache enabled, the execution holds a lock shared by every process using the cache
+    directory: a process waiting on the lock finds the result of the process holding it in the
+    cache once it gets the lock.
+    """
+
+    if not cache:
+        return _execute_detect(args, timeout, verbose, cache, save_df, on_track)
+
+    with fmdt.cache.lock(args.detect_args.cache_key()):
+        return _execute_detect(args, timeout, verbose, cache, save_df, on_track)
+
+def _execute_detect(
+        args: fmdt.args.Args,
+        timeout: float | None,
+        verbose: bool,
+        cache: bool,
+        save_df: bool,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+
+    log_in_cache = save_df and args.detect_args.log_path is None
+    cached = _setup_detect(args, cache, save_df, verbose)
+
+    if not cached is None:
+        return cached
+
+    # Spit out the commandline arguments for fmdt-detect
+    argv = args.detect_args.argv()
+    cache_trk = args.detect_args.cache_trk() if cache else None
+
+    #============ Retrieve Tracked list ===========================================#
+    if args.trk_path() is None:
+        run = _run_detect(args.gen_unique_trk(), argv, timeout, verbose, cache, cache_trk, tmp_file=True, on_track=on_track)
+    else:
+        run = _run_detect(args.trk_path(), argv, timeout, verbose, cache, cache_trk, on_track=on_track)
+
+    return _detect_result(args, run, cache, log_in_cache)
+
+class _Flight:
+    """A detection in progress, that callers asking for the same detection wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_done_callback(self, fn) -> None:
+        """Call `fn()` once the detection is over, from the thread that ran it (or right away if it already is)"""
+
+        with self._lock:
+            if not self.done.is_set():
+                self._callbacks.append(fn)
+                return
+
+        fn()
+
+    def finish(self) -> None:
+        with self._lock:
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for fn in callbacks:
+            fn()
+
+# flight key -> _Flight
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def _flight_key(args: fmdt.args.Args, timeout: float | None, cache: bool, save_df: bool) -> tuple:
+    """Two calls to fmdt.detect with the same key produce the same DetectionResult.
+
+    The tracks file is left out: a caller that shares the result of another one gets a copy of it.
+    """
+    d_args = args.detect_args
+    return (d_args.cache_key(), d_args.log_path, d_args.trk_roi_path, timeout, cache, save_df)
+
+def _single_flight(key: tuple, run) -> tuple[fmdt.res.DetectionResult, bool]:
+    """Call `run` unless a call with the same `key` is already in progress, in which case wait for its result.
+
+    Return
+    ------
+    (result, shared): The DetectionResult and whether it was produced by another caller
+    """
+
+    flight, leader = _join_flight(key)
+
+    if not leader:
+        flight.done.wait()
+
+        if not flight.error is None:
+            raise flight.error
+
+        return flight.result, True
+
+    try:
+        flight.result = run()
+    except BaseException as err:
+        flight.error = err
+        raise
+    finally:
+        _land_flight(key, flight)
+
+    return flight.result, False
+
+def _join_flight(key: tuple) -> tuple[_Flight, bool]:
+    """Return the _Flight in progress for `key` and whether the caller leads it (i.e. has to run it)"""
+
+    with _INFLIGHT_LOCK:
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+
+        if leader:
+            flight = _Flight()
+            _INFLIGHT[key] = flight
+
+    return flight, leader
+
+def _land_flight(key: tuple, flight: _Flight) -> None:
+    """Called by the leader of `flight` once its result (or error) is set"""
+
+    with _INFLIGHT_LOCK:
+        del _INFLIGHT[key]
+
+    flight.finish()
+
+def _shared_result(
+        res: fmdt.res.DetectionResult,
+        args: fmdt.args.Args,
+        on_track = None
+    ) -> fmdt.res.DetectionResult:
+    """Hand the DetectionResult of another caller to a caller that asked for the same detection"""
+
+    if not on_track is None:
+        for t in res.trk_list:
+            on_track(t)
+
+    # Same detection written to another tracks file. When the leader kept no tracks file (or only a
+    # temporary one), the tracks in memory are written instead
+    if not args.trk_path() is None and args.trk_path() != res.args.trk_path():
+        if not res.args.trk_path() is None and os.path.exists(res.args.trk_path()):
+            shutil.copyfile(src=res.args.trk_path(), dst=args.trk_path())
+        else:
+            fmdt.core.write_tracks_file(args.trk_path(), res.trk_list)
+
+    # Every caller gets its own tracks and DataFrame, modifying them doesn't affect the other callers
+    shared = copy.copy(res)
+    shared.args = args
+    shared.trk_list = [copy.copy(t) for t in res.trk_list]
+
+    if not res.df is None:
+        shared.df = res.df.copy()
+
+    return shared
+
+def _setup_detect(
+        args: fmdt.args.Args,
+        cache: bool,
+        save_df: bool,
+        verbose: bool
+    ) -> fmdt.res.DetectionResult | None:
+    """Handle the logic of fmdt.detect that comes before executing `fmdt-detect`
+
+    Return the cached DetectionResult when there is a cache hit, otherwise prepare the log
+    directory and return None.
+    """
+
+    log_path = args.detect_args.log_path
+
+    if cache:
+        cache_trk = args.detect_args.cache_trk()
+        cache_df = args.detect_args.cache_df()
+
+        # Log files are not cached, so a run with an explicit log_path always executes fmdt-detect
+        if log_path is None and _is_cached(cache_trk, cache_df, save_df):
+            return _load_cached_detection(args, cache_trk, cache_df if save_df else None, verbose)
+
     if not log_path is None:
 
         if verbose:
@@ -181,18 +403,23 @@ def detect(
         print("Save_df activated in final detect call")
         args.detect_args.log_path = args.detect_args.cache_dir()
 
-    # Spit out the commandline arguments for fmdt-detect
-    argv = args.detect_args.argv()
-    cache_file = None
+    return None
 
-    if cache:
-        cache_file = args.detect_args.cache_trk()
+def _detect_result(
+        args: fmdt.args.Args,
+        run: tuple,
+        cache: bool,
+        log_in_cache: bool
+    ) -> fmdt.res.DetectionResult:
+    """Handle the logic of fmdt.detect that comes after executing `fmdt-detect`
 
-    #============ Retrieve Tracked list ===========================================#
-    if args.trk_path() is None:
-        trk_list, nframes = _run_detect(args.gen_unique_trk(), argv, timeout, verbose, cache, cache_file, tmp_file=True)
-    else:
-        trk_list, nframes = _run_detect(args.trk_path(), argv, timeout, verbose, cache, cache_file)
+    Parameters
+    ----------
+    run (tuple): (trk_list, nframes, status, returncode, usage) as returned by _run_detect
+    log_in_cache (bool): True when the log files were written to the cache directory because of `save_df`
+    """
+
+    trk_list, nframes, status, returncode, usage = run
 
     #============= Recover data if log_path =======================================#
     if not args.detect_args.log_path is None:
@@ -215,8 +442,197 @@ def detect(
                 'std_dev': [0.0] + std_devs
             })
 
+    # Only complete runs are cached, a partial result must not be served as a cache hit
+    if cache and not df is None and status == fmdt.res.RunStatus.OK:
+        cache_df = args.detect_args.cache_df()
+        df.to_csv(cache_df, index=False)
+        fmdt.cache.register(cache_df)
+
+    if log_in_cache:
+        fmdt.cache.register(args.detect_args.log_path)
+
+    return fmdt.res.DetectionResult(nframes, df, args, trk_list, status=status, returncode=returncode, usage=usage)
+
+def _is_cached(cache_trk: str, cache_df: str, save_df: bool) -> bool:
+    """Return True if the cache holds every file needed to rebuild a DetectionResult"""
+
+    if not os.path.exists(cache_trk):
+        return False
+
+    return not save_df or os.path.exists(cache_df)
+
+def _load_cached_detection(
+        args: fmdt.args.Args,
+        cache_trk: str,
+        cache_df: str | None,
+        verbose: bool
+    ) -> fmdt.res.DetectionResult:
+    """Rebuild the DetectionResult of a previous call to fmdt-detect from the files in the cache
+
+    The cached tracks are copied to `args.trk_path()` so that the result can be used exactly like
+    a fresh detection (for example with DetectionResult.check()).
+    """
+
+    if verbose:
+        print(f"Loading cached detection {cache_trk}")
+
+    fmdt.cache.touch(cache_trk)
+
+    if not cache_df is None:
+        fmdt.cache.touch(cache_df)
+
+    trk_path = args.trk_path()
+
+    if not trk_path is None:
+        shutil.copyfile(src=cache_trk, dst=trk_path)
+
+    output = fmdt.core.read_detect_output(cache_trk)
+    trk_list = output.trk_list()
+    nframes = output.nframes
+
+    if cache_df is None:
+        df = None
+    else:
+        df = pd.read_csv(cache_df)
+
     return fmdt.res.DetectionResult(nframes, df, args, trk_list)
 
+def detect_many(
+        args: list[fmdt.args.DetectArgs],
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        cache: bool = False,
+        save_df: bool = False,
+        verbose: bool = False,
+        scheduler: fmdt.sched.Scheduler | None = None
+    ):
+    """Call `fmdt-detect` once for every configuration in `args`, running up to `max_workers`
+    processes at the same time.
+
+    DetectionResults are yielded in the order that the runs complete, not in the order of `args`.
+    A run that raises does not stop the batch: its DetectionResult is yielded with the exception
+    stored in the `error` field and an empty trk_list.
+
+    Identical configurations are executed once, every one of them yields the shared DetectionResult.
+
+    Parameters
+    ----------
+    args (list[fmdt.args.DetectArgs]): Configurations to detect. Each one is copied before being executed,
+        so the caller's objects are never modified.
+    max_workers (int): Maximum number of concurrent `fmdt-detect` processes. Default os.cpu_count(), or the
+        core budget of `scheduler`
+    timeout (float): timeout in seconds applied to each individual run. Default None.
+    cache (bool): Forwarded to fmdt.detect for every run.
+    save_df (bool): Forwarded to fmdt.detect for every run.
+    verbose (bool): Print logging messages to stdout (True) or do nothing (False). Default False.
+    scheduler (fmdt.sched.Scheduler): When given, a run only starts once the `vid_in_threads` cores it needs
+        are free in the scheduler's budget (and is pinned to them if the scheduler pins jobs). Default None
+
+    Examples
+    --------
+    >>> args = [fmdt.DetectArgs(vid_in_path=v, ccl_hyst_lo=lo) for v in videos for lo in [200, 220, 240]]
+    >>> for res in fmdt.detect_many(args, max_workers=8):
+    ...     print(res.vid_path(), res.n_meteors_detected())
+
+    >>> sched = fmdt.Scheduler(cores=64, pin=True)
+    >>> results = list(fmdt.detect_many(args, scheduler=sched))
+    >>> print(sched.report())
+    """
+
+    jobs = _independent_detect_args(args)
+
+    if max_workers is None and scheduler is None:
+        max_workers = os.cpu_count() or 1
+    elif max_workers is None:
+        # Every job reserves at least one core, so the budget bounds the number of running jobs
+        max_workers = scheduler.cores
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    try:
+        futures = [pool.submit(_detect_job, a, timeout, cache, save_df, verbose, scheduler) for a in jobs]
+
+        for fut in as_completed(futures):
+            yield fut.result()
+
+    finally:
+        # Don't launch the pending runs if the caller stops iterating early
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _detect_job(
+        d_args: fmdt.args.DetectArgs,
+        timeout: float | None,
+        cache: bool,
+        save_df: bool,
+        verbose: bool,
+        scheduler: fmdt.sched.Scheduler | None = None
+    ) -> fmdt.res.DetectionResult:
+    """Execute a single run of detect_many, storing any exception in the returned DetectionResult"""
+
+    try:
+        if scheduler is None:
+            return d_args.exec(verbose=verbose, timeout=timeout, cache=cache, save_df=save_df)
+
+        with scheduler.slot(d_args):
+            res = d_args.exec(verbose=verbose, timeout=timeout, cache=cache, save_df=save_df)
+
+        scheduler.record(d_args, res.max_rss())
+
+        return res
+
+    except Exception as err:
+        if verbose:
+            fmdt.utils.stderr(f"fmdt-detect failed for {d_args.vid_in_path}: {err}")
+
+        args = fmdt.args.Args(detect_args=d_args, verbose=verbose, timeout=timeout)
+        return fmdt.res.DetectionResult(0, None, args, [], error=err)
+
+def _independent_detect_args(args: list[fmdt.args.DetectArgs]) -> list[fmdt.args.DetectArgs]:
+    """Copy a list of DetectArgs so that concurrent runs never write to the same output files.
+
+    Configurations without a `trk_path` normally write to '<video>_trk.txt'. When several of them
+    share a video, each one gets a file name derived from its digest instead.
+
+    Identical configurations are allowed: they keep identical paths and fmdt.detect executes them
+    only once (see _single_flight).
+    """
+
+    jobs = [copy.deepcopy(a) for a in args]
+
+    def default_trk(a: fmdt.args.DetectArgs) -> str:
+        name, _ = fmdt.utils.decompose_video_filename(os.path.basename(a.vid_in_path))
+        return name + "_trk.txt"
+
+    # default tracks file -> digests of the distinct configurations that would write to it
+    defaults = {}
+
+    for a in jobs:
+        if a.trk_path is None:
+            defaults.setdefault(default_trk(a), set()).add(a.digest())
+
+    for a in jobs:
+        if a.trk_path is None and len(defaults[default_trk(a)]) > 1:
+            name, _ = fmdt.utils.decompose_video_filename(os.path.basename(a.vid_in_path))
+            prefix = name + "_"
+
+            if a.trk_roi_path is None:
+                a.trk_roi_path = a.gen_unique_file(prefix=prefix, suffix="_trk2roi.txt")
+
+            a.trk_path = a.gen_unique_file(prefix=prefix, suffix="_trk.txt")
+
+    # Any remaining collision between distinct configurations comes from paths chosen by the caller
+    distinct = list({a.digest(): a for a in jobs}.values())
+    trk_paths = [default_trk(a) if a.trk_path is None else a.trk_path for a in distinct]
+    log_paths = [a.log_path for a in distinct if not a.log_path is None]
+
+    for field, paths in [("trk_path", trk_paths), ("log_path", log_paths)]:
+        duplicates = set([p for p in paths if paths.count(p) > 1])
+
+        if len(duplicates) > 0:
+            raise ValueError(f"detect_many cannot run concurrent detections that share the same {field}: {duplicates}")
+
+    return jobs
+
 def log_parser(
         log_path: str,
         trk_roi_path: str | None = None,
@@ -258,14 +674,14 @@ def log_parser(
     if stdout is None:
 
         stdout = log_parser_args.gen_unique_file(prefix="log_parser_")
-        _run_process(stdout, argv, verbose, tmp_file=True)
+        usage = _run_process(stdout, argv, verbose, tmp_file=True)
 
     else:
-        _run_process(stdout, argv, verbose)
+        usage = _run_process(stdout, argv, verbose)
 
     args = fmdt.args.Args(log_parser_args=log_parser_args, detect_args=None, visu_args=None, verbose=verbose)
 
-    return fmdt.res.LogParserResult(args)
+    return fmdt.res.LogParserResult(args, usage)
 
 def visu(
         vid_in_path: str,
@@ -305,13 +721,13 @@ def visu(
 
     if stdout is None:
         stdout = visu_args.gen_unique_file(prefix="visu_")
-        _run_process(stdout, argv, verbose, tmp_file=True)
+        usage = _run_process(stdout, argv, verbose, tmp_file=True)
     else:
-        _run_process(stdout, argv, verbose)
+        usage = _run_process(stdout, argv, verbose)
 
     args = fmdt.args.Args(visu_args=visu_args, detect_args=None, log_parser_args=None)
 
-    return fmdt.res.VisuResult(args)
+    return fmdt.res.VisuResult(args, usage)
 
 def check(
         trk_path: str,
@@ -328,49 +744,125 @@ def check(
 
     argv = fmdt.args.handle_check_args(trk_path, gt_path)
 
-    _run_process(stdout, argv, verbose, False)
+    usage = _run_process(stdout, argv, verbose, False)
 
     stats = fmdt.res.load_check_stats(stdout)
     gt_table = fmdt.res.load_check_gt_table(stdout)
 
-    return fmdt.res.CheckResult(gt_table=gt_table, stats=stats, args=args)
+    return fmdt.res.CheckResult(gt_table=gt_table, stats=stats, args=args, usage=usage)
 
-def detect_directory(dir_name: str, args: fmdt.args.Args, verbose=False):
+MANIFEST_COLUMNS = ["video", "digest", "status", "returncode", "nframes", "n_meteors",
+                    "wall_time", "user_time", "sys_time", "max_rss", "fps"]
+
+def detect_directory(
+        dir_name: str,
+        args: fmdt.args.Args,
+        verbose: bool = False,
+        max_workers: int | None = None,
+        manifest: str | None = None,
+        cache: bool = False,
+        scheduler: fmdt.sched.Scheduler | None = None
+    ) -> pd.DataFrame:
     """Call `fmdt-detect` on all videos in the directory `dir_name` using the settings stored in `args`
 
+    The videos are detected over a pool of workers (see fmdt.detect_many) and every finished run is
+    appended to a csv manifest as soon as it completes, so an interrupted batch still leaves a record
+    of the videos that were processed.
+
     Parameters
     ----------
     dir_name (str): Path to the directory of videos that you'd like to detect
-    args: (fmdt.args.Args): Configuration of parameters used to call fmdt.detect
-
+    args: (fmdt.args.Args): Configuration of parameters used to call fmdt.detect. It is copied for every
+        video: `vid_in_path` is set to the video, `trk_path` and `trk_roi_path` are reset to their
+        per-video defaults and the logs of each video are stored in a sub directory of `log_path`.
+    max_workers (int): Maximum number of concurrent `fmdt-detect` processes. Default os.cpu_count()
+    manifest (str): Path of the csv manifest. Default '<dir_name>_manifest.csv' in the working directory
+    cache (bool): Forwarded to fmdt.detect for every video
+    scheduler (fmdt.sched.Scheduler): Forwarded to fmdt.detect_many
+
+    Return
+    ------
+    A DataFrame with one row per video and the columns of fmdt.api.MANIFEST_COLUMNS. The `digest`
+    column holds the first 16 characters of DetectArgs.cache_key()
 
+    Examples
+    --------
+    >>> args = fmdt.detect_args(ccl_hyst_lo=190, ccl_hyst_hi=235, timeout=600)
+    >>> table = fmdt.detect_directory("/data/2022_05_31", args, max_workers=8)
+    >>> table[table.status != "ok"]
     """
 
-    entries = listdir(dir_name)
+    entries = sorted(listdir(dir_name))
     is_video_fn = lambda v: v[-3:] == "mp4" or v[-3:] == "avi"
     videos = [e for e in entries if is_video_fn(e)]
 
     assert len(videos) > 0, "Directory is empty, call to fmdt.detect_directory failed"
 
-    # Now let's call fmdt detect one time for each video
+    if manifest is None:
+        manifest = os.path.basename(os.path.normpath(dir_name)) + "_manifest.csv"
+
+    if not args.detect_args.log_path is None:
+        fmdt.utils.mkdir_p(args.detect_args.log_path)
+
+    jobs = [_directory_job(args.detect_args, fmdt.utils.join(dir_name, v)) for v in videos]
+
+    rows = []
     failing_cmds = []
-    i = 0
-    for v in videos:
 
-        args.detect_args["vid_in_path"] = dir_name + "/" + v
+    with open(manifest, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS)
+        writer.writeheader()
+        f.flush()
 
-        fail = args.does_detect_fail(verbose=verbose)
-        if verbose:
-            print(f"{v} fails? {fail}")
+        for res in detect_many(jobs, max_workers=max_workers, timeout=args.timeout, cache=cache, verbose=verbose, scheduler=scheduler):
+
+            row = _manifest_row(res)
+            writer.writerow(row)
+            f.flush()
+            rows.append(row)
 
-        if (fail):
-            failing_cmds.append(" ".join(args.detect_cmd()))
+            if verbose:
+                print(f"{os.path.basename(row['video'])}: {row['status']}, {row['n_meteors']} meteor(s) in {row['wall_time']:.2f}s")
 
-        i = i + 1
+            if not res.ok():
+                failing_cmds.append(res.cmd())
 
     for c in failing_cmds:
         print(c)
 
+    return pd.DataFrame(rows, columns=MANIFEST_COLUMNS)
+
+def _directory_job(template: fmdt.args.DetectArgs, vid_in_path: str) -> fmdt.args.DetectArgs:
+    """Copy of `template` that detects `vid_in_path` without sharing output files with other videos"""
+
+    d_args = copy.deepcopy(template)
+    d_args.vid_in_path = vid_in_path
+    d_args.trk_path = None
+    d_args.trk_roi_path = None
+
+    if not template.log_path is None:
+        name, _ = fmdt.utils.decompose_video_filename(os.path.basename(vid_in_path))
+        d_args.log_path = fmdt.utils.join(template.log_path, name)
+
+    return d_args
+
+def _manifest_row(res: fmdt.res.DetectionResult) -> dict:
+
+    row = {
+        "video": res.vid_path(),
+        "digest": res.args.detect_args.cache_key()[0:16],
+        "status": str(res.status),
+        "returncode": res.returncode,
+        "nframes": res.nframes,
+        "n_meteors": res.n_meteors_detected()
+    }
+
+    # Cache hits and runs that raised don't have a resource usage
+    usage = fmdt.res.ResourceUsage(0.0) if res.usage is None else res.usage
+    row.update(usage.to_dict())
+
+    return row
+
 
 # ===================== _run_$EXECUTABLE ======================================
 def _run_detect(
@@ -380,70 +872,80 @@ def _run_detect(
         verbose: bool,
         cache: bool,
         cache_file: str,
-        tmp_file: bool = False
-    ) -> tuple[list[fmdt.core.TrackedObject], int]:
+        tmp_file: bool = False,
+        on_track = None
+    ) -> tuple[list[fmdt.core.TrackedObject], int, fmdt.res.RunStatus, int, fmdt.res.ResourceUsage]:
     """Handle the final logic of calling `fmdt-detect`
 
+    The stdout of `fmdt-detect` is streamed line by line to `trk_path` (and to the console when
+    `verbose` is True) and the tracking table is parsed while the process is running, so memory
+    usage doesn't grow with the length of the output.
+
+    When `timeout` expires the process is terminated (then killed if it doesn't exit) and the
+    tracks and frame count printed so far are returned with RunStatus.TIMEOUT.
 
     Parameters
     ----------
     tmp_file (bool): Indicates whether `trk_path` is a temporary file that should be deleted after execution.
         Default False
+    on_track (Callable[[TrackedObject], None]): Called with each TrackedObject as soon as it is read
 
+    Return
+    ------
+    (trk_list, nframes, status, returncode, usage)
     """
 
-    with open(trk_path, 'w') as outfile:
+    if verbose:
+        print(f"Executing cmd: {' '.join(argv)}")
 
-        if verbose:
-            print(f"Executing cmd: {' '.join(argv)}")
+        if tmp_file:
+            print(f"{trk_path} marked as a temporary file")
 
-            if tmp_file:
-                print(f"{trk_path} marked as a temporary file")
+    parser = fmdt.core.TrackParser(on_track)
 
-        if not timeout is None:
-            try:
-                proc = subprocess.Popen(argv, stdout=subprocess.PIPE)
-                outs, _ = proc.communicate(timeout=timeout)
-                lines = outs.decode("utf-8").split("\n")
-                for line in lines:
-                    if verbose:
-                        print(line)
-                    outfile.write(line + "\n")
-                proc.wait(timeout=timeout)
-            except:
-                print("==================================================================")
-                print("")
-                print(f"Subprocess timed out for \n\t{colored(' '.join(argv), 'blue')}")
-                print("")
-                print("==================================================================")
-                return [], 0
-        else:
-            proc = subprocess.Popen(argv, stdout=subprocess.PIPE)
-            outs, _ = proc.communicate()
-            lines = outs.decode("utf-8").split("\n")
-            for line in lines:
-                if verbose:
-                    print(line)
-                outfile.write(line + "\n")
-            proc.wait()
-
-    trk_list = fmdt.core.extract_all_information(trk_path)
-    nframes = fmdt.core.nframes_processed(trk_path)
+    with open(trk_path, 'w', encoding="utf-8") as outfile:
+        returncode, timed_out, usage = _stream_process(argv, outfile, timeout, verbose, parser.feed)
 
-    if cache:
+    usage.nframes = parser.nframes
+    status = _run_status(returncode, timed_out)
+
+    if status == fmdt.res.RunStatus.TIMEOUT:
+        _print_timeout(argv, timeout, len(parser.trk_list))
+    elif status == fmdt.res.RunStatus.FAILED:
+        fmdt.utils.stderr(f"fmdt-detect exited with code {returncode} for \n\t{' '.join(argv)}")
+
+    if cache and status == fmdt.res.RunStatus.OK:
         shutil.copyfile(src=trk_path, dst=cache_file)
+        fmdt.cache.register(cache_file)
 
     if tmp_file:
         os.remove(trk_path)
 
-    return trk_list, nframes
+    return parser.trk_list, parser.nframes, status, returncode, usage
+
+def _run_status(returncode: int, timed_out: bool) -> fmdt.res.RunStatus:
+
+    # A process that completed right as its timer expired exits with 0, its output is complete
+    if returncode == 0:
+        return fmdt.res.RunStatus.OK
+    elif timed_out:
+        return fmdt.res.RunStatus.TIMEOUT
+    else:
+        return fmdt.res.RunStatus.FAILED
+
+def _print_timeout(argv: list[str], timeout: float, n_tracks: int) -> None:
+    print("==================================================================")
+    print("")
+    print(f"Subprocess timed out after {timeout}s ({n_tracks} tracks kept) for \n\t{colored(' '.join(argv), 'blue')}")
+    print("")
+    print("==================================================================")
 
 def _run_process(
         stdout_file,
         argv: list[str],
         verbose: bool,
         tmp_file: bool = False
-    ) -> tuple[list[fmdt.core.TrackedObject], int]:
+    ) -> fmdt.res.ResourceUsage:
     """Handle the final logic of calling `fmdt-log-parser`
 
     Parameters
@@ -453,19 +955,146 @@ def _run_process(
         Default False
 
     """
-    with open(stdout_file, 'w') as outfile:
+    if verbose:
+        print(f"Executing cmd: {' '.join(argv)}")
 
-        if verbose:
-            print(f"Executing cmd: {' '.join(argv)}")
+    with open(stdout_file, 'w', encoding="utf-8") as outfile:
+        _, _, usage = _stream_process(argv, outfile, None, verbose)
+
+    if tmp_file:
+        os.remove(stdout_file)
+
+    return usage
+
+def _stream_process(
+        argv: list[str],
+        outfile,
+        timeout: float | None,
+        verbose: bool,
+        on_line = None
+    ) -> tuple[int, bool, fmdt.res.ResourceUsage]:
+    """Execute `argv`, copying each line of its stdout to `outfile` as soon as it is produced
+
+    Parameters
+    ----------
+    outfile: Open text file that receives the stdout of the process
+    timeout (float): Number of seconds after which the process is killed. Default None
+    verbose (bool): When True, also print each line to the console
+    on_line (Callable[[str], None]): Called with every line of stdout
+
+    Return
+    ------
+    (returncode, timed_out, usage): The exit code of the process, whether it was stopped because it exceeded
+        `timeout` and its ResourceUsage
+    """
+
+    start = time.monotonic()
+    # Decoded as UTF-8 whatever the locale, like the output of fmdt-detect always was
+    proc = subprocess.Popen(argv, stdout=subprocess.PIPE, encoding="utf-8", errors="replace")
+    expired = threading.Event()
+    reaped = threading.Event()
+    reaping = threading.Lock()
+    watchdog = None
+    rusage = None
+
+    def expire():
+        expired.set()
+        _terminate(proc, reaped, reaping)
+
+    if not timeout is None:
+        watchdog = threading.Timer(timeout, expire)
+        watchdog.start()
+
+    try:
+        for line in proc.stdout:
+            outfile.write(line)
 
-        proc = subprocess.Popen(argv, stdout=subprocess.PIPE)
-        outs, _ = proc.communicate()
-        lines = outs.decode("utf-8").split("\n")
-        for line in lines:
             if verbose:
-                print(line)
-            outfile.write(line + "\n")
+                print(line, end="")
+
+            if not on_line is None:
+                on_line(line)
+
+        rusage = _wait(proc, reaping)
+    finally:
+        if proc.returncode is None:
+            _signal(proc, _SIGKILL, reaping)
+            rusage = _wait(proc, reaping)
+
+        reaped.set()
+
+        if not watchdog is None:
+            watchdog.cancel()
+
+        proc.stdout.close()
+
+    usage = fmdt.res.ResourceUsage(time.monotonic() - start)
+
+    if not rusage is None:
+        usage.user = rusage.ru_utime
+        usage.sys = rusage.ru_stime
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        usage.max_rss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+    return proc.returncode, expired.is_set(), usage
+
+# SIGKILL doesn't exist on Windows, where SIGTERM already ends the process
+_SIGKILL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+# Seconds between two checks for the exit of a process where it can't be waited for without being reaped
+_REAP_POLL = 0.01
+
+def _signal(proc: subprocess.Popen, sig: int, reaping: threading.Lock) -> None:
+    """Send `sig` to `proc` unless it has been reaped.
+
+    Popen.send_signal polls (and thus reaps) the process first, which would lose its resource
+    usage, so the signal is sent directly. An exited but unreaped process keeps its pid. `reaping`
+    is held by _wait while it reaps the process, so the pid is never signaled once it has been
+    released (and possibly reused by another process).
+    """
+    with reaping:
+        if proc.returncode is None:
+            try:
+                os.kill(proc.pid, sig)
+            except ProcessLookupError:
+                pass
+
+def _wait(proc: subprocess.Popen, reaping: threading.Lock):
+    """Reap `proc`, returning its resource usage (a resource.struct_rusage) when the platform reports it
+
+    The exit of the process is waited for without holding `reaping` (so that _signal can still stop
+    it), then it is reaped and its returncode set while holding it.
+    """
+
+    if not hasattr(os, "wait4"):
+        # Windows signals the process handle, which is never reused while Popen holds it
         proc.wait()
+        return None
 
-    if tmp_file:
-        os.remove(stdout_file)
\ No newline at end of file
+    if hasattr(os, "waitid"):
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+
+        with reaping:
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+        return rusage
+
+    # macOS has no waitid: poll without blocking
+    while True:
+        with reaping:
+            pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+
+            if pid != 0:
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                return rusage
+
+        time.sleep(_REAP_POLL)
+
+def _terminate(proc: subprocess.Popen, reaped: threading.Event, reaping: threading.Lock) -> None:
+    """Ask `proc` to stop, killing it if it hasn't been reaped after TERMINATE_GRACE seconds"""
+
+    _signal(proc, signal.SIGTERM, reaping)
+
+    if not reaped.wait(TERMINATE_GRACE):
+        _signal(proc, _SIGKILL, reaping)
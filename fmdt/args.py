@@ -45,6 +45,11 @@ _DEFAULT_DETECT_ARGS = {
     "log_path": None
 }
 
+# DetectArgs that only name output files or tune performance. They are left out of
+# DetectArgs.cache_key() since they don't change the tracks produced by fmdt-detect
+_CACHE_KEY_EXCLUDED_ARGS = ['vid_in_path', 'vid_in_buff', 'vid_in_threads', 'ccl_fra_path',
+                            'trk_roi_path', 'log_path', 'trk_path']
+
 # List of keyword arguments that are unique to visu
 _VISU_UNIQUE_ARGS = ['trk_id', 'trk_nat_num', 'trk_only_meteor', 'gt_path', 'vid_out_path']
 _LOG_PARSER_UNIQUE_ARGS = []
@@ -357,10 +362,34 @@ class DetectArgs(AbstractExecutableArgs):
 
         return c
 
+    def cache_key(self) -> str:
+        """Return the key used to store this detection in the fmdt cache
+
+        Unlike digest(), the key ignores output paths and performance-only parameters and identifies
+        the input video by the fingerprint of its content (see fmdt.utils.video_fingerprint) rather
+        than by its name.
+        """
+        d = self.to_reduced_dict()
+        key = [(k, v) for (k, v) in d.items() if not k in _CACHE_KEY_EXCLUDED_ARGS]
+
+        if not self.vid_in_path is None and os.path.exists(self.vid_in_path):
+            key.append(("vid_in_fingerprint", fmdt.utils.video_fingerprint(self.vid_in_path)))
+        else:
+            key.append(("vid_in_path", self.vid_in_path))
+
+        return hashlib.md5(pickle.dumps(sorted(key))).hexdigest()
+
+    def cache_dir(self) -> str:
+        return fmdt.cache_dir() + "/" + self.cache_key()[0:16]
+
     def cache_trk(self) -> str:
         """Generate the full path to a unique file to store the results of this detection"""
         return self.cache_dir() + "_trk.txt"
 
+    def cache_df(self) -> str:
+        """Generate the full path to a unique file to store the log dataframe of this detection"""
+        return self.cache_dir() + "_df.csv"
+
     @staticmethod
     def sql_create_table(table_name: str = "detect_args") -> str:
         """Return the SQL instructions to create a DetectArgs table named `table_name`"""
@@ -953,7 +982,7 @@ class Args:
         """Retreive the list of TrackedObject that is stored in the trk_path file"""
         assert not self.detect_args.trk_path is None, "Out track file not stored"
 
-        return fmdt.core.extract_all_information(self.detect_args.trk_path)
+        return fmdt.core.read_track_table(self.detect_args.trk_path).to_list()
 
     def command(self) -> str:
         """Return the command used to execute fmdt-detect with this configuration"""
@@ -0,0 +1,450 @@
+"""Module dedicated to the bookkeeping of the fmdt cache directory
+
+Every file or directory written to `fmdt.cache_dir()` is recorded in a small SQLite index
+(`index.db`) along with its size, the last time it was accessed and its number of hits. The total
+size of the cache is stored in the index as well, so it never has to be computed by walking the
+cache directory. Once the total grows above a high watermark, entries are evicted in LRU (or LFU)
+order until it falls below a low watermark.
+
+It also holds the file locks used to make sure that a single process at a time executes a given
+detection (see `lock`).
+
+Parsed tracking tables of the tracks files held by the cache are cached as well: `track_table`
+stores the TrackTable of such a file as a `.npy` entry of the cache and maps it back into memory
+instead of parsing the text again.
+
+Public API:
+    register
+    touch
+    total_size
+    evict
+    set_limits
+    lock
+    track_table
+"""
+import os
+import time
+import shutil
+import sqlite3
+import hashlib
+import contextlib
+import numpy as np
+import fmdt.config
+import fmdt.core
+
+from fmdt.utils import stderr
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: cross-process locks are not available
+    fcntl = None
+
+_KB = 1024
+_MB = 1024 * _KB
+_GB = 1024 * _MB
+
+_INDEX_FILE = "index.db"
+_LOCK_DIR = "locks"
+_TRACKS_SUFFIX = "_tracks.npy"
+
+_HIGH_WATERMARK_BYTES = 100 * _MB
+_LOW_WATERMARK_BYTES = 80 * _MB
+_POLICIES = ["lru", "lfu"]
+_POLICY = "lru"
+
+def set_limits(high_bytes: int | None = None, low_bytes: int | None = None, policy: str | None = None) -> None:
+    """Configure when (high_bytes) and down to what size (low_bytes) the cache gets evicted.
+
+    Parameters
+    ----------
+    high_bytes (int): Size of the cache that triggers an eviction. Default 100MB
+    low_bytes (int): Size that the cache is brought down to during an eviction. Default 80MB
+    policy (str): "lru" evicts the least recently used entries first, "lfu" the least frequently used
+    """
+    global _HIGH_WATERMARK_BYTES, _LOW_WATERMARK_BYTES, _POLICY
+
+    if not high_bytes is None:
+        _HIGH_WATERMARK_BYTES = high_bytes
+
+    if not low_bytes is None:
+        _LOW_WATERMARK_BYTES = low_bytes
+
+    if not policy is None:
+        assert policy in _POLICIES, f"Unknown cache eviction policy '{policy}', expected one of {_POLICIES}"
+        _POLICY = policy
+
+    assert _LOW_WATERMARK_BYTES <= _HIGH_WATERMARK_BYTES, "The low watermark of the cache must not exceed its high watermark"
+
+def get_limits() -> tuple[int, int, str]:
+    """Return the (high_bytes, low_bytes, policy) configuration of the cache"""
+    return _HIGH_WATERMARK_BYTES, _LOW_WATERMARK_BYTES, _POLICY
+
+def index_path() -> str:
+    return os.path.join(fmdt.config.cache_dir(), _INDEX_FILE)
+
+def is_reserved(name: str) -> bool:
+    """Return True if `name` is used by the bookkeeping of the cache rather than being a cache entry"""
+    return name.startswith(_INDEX_FILE) or name == _LOCK_DIR
+
+@contextlib.contextmanager
+def lock(key: str):
+    """Hold an exclusive lock named `key`, shared by every process using this cache directory.
+
+    Does nothing on platforms without fcntl. The lock files are removed by `clear`.
+
+    >>> with fmdt.cache.lock(d_args.cache_key()):
+    ...     # Only one process at a time gets here for this key
+    """
+    if fcntl is None:
+        yield
+        return
+
+    lock_dir = os.path.join(fmdt.config.cache_dir(), _LOCK_DIR)
+    os.makedirs(lock_dir, exist_ok=True)
+    path = os.path.join(lock_dir, key + ".lock")
+
+    while True:
+        f = open(path, 'a')
+        fcntl.flock(f, fcntl.LOCK_EX)
+
+        # The file may have been removed by `clear` while we waited for it: lock the new one instead
+        try:
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                break
+        except FileNotFoundError:
+            pass
+
+        f.close()
+
+    try:
+        yield
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+def _remove_locks() -> None:
+    """Remove the lock files that no process holds"""
+
+    lock_dir = os.path.join(fmdt.config.cache_dir(), _LOCK_DIR)
+
+    if fcntl is None or not os.path.isdir(lock_dir):
+        return
+
+    for name in os.listdir(lock_dir):
+        path = os.path.join(lock_dir, name)
+
+        with open(path, 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # A detection is running
+                continue
+
+            # Unless another call removed it first, and a new file was created since
+            try:
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _connect() -> sqlite3.Connection:
+    """Open the index, creating its tables if needed. Transactions are managed explicitly"""
+
+    con = sqlite3.connect(index_path(), timeout=30, isolation_level=None)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS entries (
+            name TEXT NOT NULL PRIMARY KEY,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL,
+            hits INTEGER NOT NULL
+        );
+        """)
+    con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT NOT NULL PRIMARY KEY, value INTEGER NOT NULL);")
+    con.execute("INSERT OR IGNORE INTO meta VALUES ('total_size', 0);")
+
+    return con
+
+def _entry_name(path: str) -> str:
+    """Name of the top-level entry of the cache directory that contains `path`"""
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(fmdt.config.cache_dir()))
+    return rel.split(os.sep)[0]
+
+def _size_on_disk(full_path: str) -> int:
+
+    if os.path.isdir(full_path):
+        return fmdt.config.size_dir(full_path)
+    elif os.path.isfile(full_path):
+        return os.path.getsize(full_path)
+    else:
+        return 0
+
+def _remove_from_disk(full_path: str) -> None:
+
+    if os.path.isdir(full_path):
+        shutil.rmtree(full_path, ignore_errors=True)
+    elif os.path.exists(full_path):
+        os.remove(full_path)
+
+def _upsert(con: sqlite3.Connection, name: str, size: int, last_access: float, hits: int) -> None:
+    """Insert or replace an entry while keeping the stored total size up to date"""
+
+    con.execute("""
+        UPDATE meta SET value = value + ? - COALESCE((SELECT size FROM entries WHERE name = ?), 0)
+        WHERE key = 'total_size';
+        """, (size, name))
+    con.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?);", (name, size, last_access, hits))
+
+def register(path: str) -> None:
+    """Record the file or directory `path`, which was just written to the cache directory.
+
+    The size of the entry is measured once, here, and the cache is evicted if it grew above
+    its high watermark.
+    """
+    name = _entry_name(path)
+    full_path = os.path.join(fmdt.config.cache_dir(), name)
+
+    if not os.path.exists(full_path):
+        return
+
+    size = _size_on_disk(full_path)
+
+    con = _connect()
+
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        hits = con.execute("SELECT hits FROM entries WHERE name = ?;", (name,)).fetchone()
+        _upsert(con, name, size, time.time(), 0 if hits is None else hits[0])
+        con.execute("COMMIT;")
+    finally:
+        con.close()
+
+    if total_size() > _HIGH_WATERMARK_BYTES:
+        evict()
+
+def touch(path: str) -> None:
+    """Mark the entry containing `path` as used, for example after a cache hit"""
+
+    name = _entry_name(path)
+    con = _connect()
+
+    try:
+        cur = con.execute("UPDATE entries SET last_access = ?, hits = hits + 1 WHERE name = ?;", (time.time(), name))
+        missing = cur.rowcount == 0
+    finally:
+        con.close()
+
+    # Entries written before the index existed are picked up on their first hit
+    if missing:
+        register(path)
+
+def unregister(path: str) -> None:
+
+    name = _entry_name(path)
+    con = _connect()
+
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        con.execute("""
+            UPDATE meta SET value = value - COALESCE((SELECT size FROM entries WHERE name = ?), 0)
+            WHERE key = 'total_size';
+            """, (name,))
+        con.execute("DELETE FROM entries WHERE name = ?;", (name,))
+        con.execute("COMMIT;")
+    finally:
+        con.close()
+
+def total_size() -> int:
+    """Return the size of the cache in bytes, as recorded in the index"""
+
+    con = _connect()
+
+    try:
+        return con.execute("SELECT value FROM meta WHERE key = 'total_size';").fetchone()[0]
+    finally:
+        con.close()
+
+def n_entries() -> int:
+
+    con = _connect()
+
+    try:
+        return con.execute("SELECT count(*) FROM entries;").fetchone()[0]
+    finally:
+        con.close()
+
+def evict(low_bytes: int | None = None, policy: str | None = None) -> int:
+    """Remove entries until the cache is no larger than `low_bytes` (default: the low watermark)
+
+    Return
+    ------
+    freed (int): The number of bytes removed from the cache
+    """
+    if low_bytes is None:
+        low_bytes = _LOW_WATERMARK_BYTES
+
+    if policy is None:
+        policy = _POLICY
+
+    if policy == "lfu":
+        order = "hits ASC, last_access ASC"
+    else:
+        order = "last_access ASC"
+
+    con = _connect()
+    freed = 0
+
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        total = con.execute("SELECT value FROM meta WHERE key = 'total_size';").fetchone()[0]
+
+        for name, size in con.execute(f"SELECT name, size FROM entries ORDER BY {order};").fetchall():
+
+            if total <= low_bytes:
+                break
+
+            _remove_from_disk(os.path.join(fmdt.config.cache_dir(), name))
+            con.execute("DELETE FROM entries WHERE name = ?;", (name,))
+            total -= size
+            freed += size
+
+        con.execute("UPDATE meta SET value = ? WHERE key = 'total_size';", (total,))
+        con.execute("COMMIT;")
+    finally:
+        con.close()
+
+    return freed
+
+def rebuild() -> None:
+    """Rebuild the index from the content of the cache directory.
+
+    This is the only operation that walks the cache. It is run when the index does not exist yet
+    (for example with a cache written by an older version of fmdt) and can be called by hand if
+    files were added or removed behind fmdt's back.
+    """
+    cd = fmdt.config.cache_dir()
+    now = time.time()
+    con = _connect()
+
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        con.execute("DELETE FROM entries;")
+        con.execute("UPDATE meta SET value = 0 WHERE key = 'total_size';")
+
+        for name in os.listdir(cd):
+            if is_reserved(name):
+                continue
+
+            full_path = os.path.join(cd, name)
+            _upsert(con, name, _size_on_disk(full_path), os.path.getatime(full_path) if os.path.exists(full_path) else now, 0)
+
+        con.execute("COMMIT;")
+    finally:
+        con.close()
+
+def clear() -> tuple[int, int]:
+    """Remove every entry of the cache
+
+    Return
+    ------
+    (n_entries, n_bytes): The number of entries and bytes removed
+    """
+    cd = fmdt.config.cache_dir()
+    n_removed = 0
+
+    for name in os.listdir(cd):
+        if is_reserved(name):
+            continue
+
+        _remove_from_disk(os.path.join(cd, name))
+        n_removed += 1
+
+    freed = total_size()
+
+    con = _connect()
+
+    try:
+        con.execute("BEGIN IMMEDIATE;")
+        con.execute("DELETE FROM entries;")
+        con.execute("UPDATE meta SET value = 0 WHERE key = 'total_size';")
+        con.execute("COMMIT;")
+    finally:
+        con.close()
+
+    _remove_locks()
+
+    return n_removed, freed
+
+def init() -> None:
+    """Make sure the index exists and evict the cache if it is above its high watermark"""
+
+    if not os.path.exists(index_path()):
+        rebuild()
+
+    if total_size() > _HIGH_WATERMARK_BYTES:
+        evict()
+
+def tracks_sidecar(trk_path: str) -> str:
+    """Path of the cache entry holding the parsed TrackTable of `trk_path`
+
+    The entry is keyed by the absolute path, size and modification time of `trk_path`, so an
+    edited or rewritten tracks file never reuses the table of its previous content.
+    """
+    st = os.stat(trk_path)
+    key = f"{os.path.abspath(trk_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+    return os.path.join(fmdt.config.cache_dir(), hashlib.sha1(key.encode()).hexdigest()[0:16] + _TRACKS_SUFFIX)
+
+def _in_cache_dir(path: str) -> bool:
+    """Return True if `path` is located inside the cache directory"""
+    return not _entry_name(path) in [os.curdir, os.pardir]
+
+def track_table(trk_path: str) -> fmdt.core.TrackTable:
+    """Return the TrackTable of the text tracks file `trk_path`, parsing it only once if it is held by the cache
+
+    For a tracks file of the cache directory (see DetectArgs.cache_trk), the first call parses
+    `trk_path` and writes its table to the cache. The following calls map that table into memory
+    with `np.load(mmap_mode="r")` instead of parsing the text again: the columns of the returned
+    TrackTable are read only. Sidecars are ordinary cache entries, so the ones of files that changed
+    or are no longer used get evicted like any other entry. A hit doesn't update the index, so their
+    eviction order is the order in which they were written.
+
+    Any other file is simply parsed with fmdt.core.read_track_table: the cache doesn't grow with
+    the tracks files written elsewhere. A file that doesn't exist holds no tracks and is not cached.
+    """
+    if not os.path.exists(trk_path):
+        return fmdt.core.TrackTable()
+
+    if not _in_cache_dir(trk_path):
+        return fmdt.core.read_track_table(trk_path)
+
+    sidecar = tracks_sidecar(trk_path)
+
+    if os.path.exists(sidecar):
+        try:
+            data = np.load(sidecar, mmap_mode="r")
+        except (OSError, ValueError):
+            # Truncated by a crash or removed by an eviction: parse the text again
+            data = None
+
+        if not data is None and data.dtype == fmdt.core.TRACK_DTYPE:
+            return fmdt.core.TrackTable(data)
+
+    table = fmdt.core.read_track_table(trk_path)
+
+    # Written to a temporary file first, so that a concurrent reader never maps a partial table
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+
+    try:
+        with open(tmp, "wb") as f:
+            np.save(f, table.data)
+
+        os.replace(tmp, sidecar)
+        register(sidecar)
+    except OSError as err:
+        stderr(f"Could not cache the tracks of {trk_path} ({err})")
+
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    return table
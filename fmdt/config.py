@@ -5,9 +5,7 @@ from appdirs import AppDirs
 import fmdt.truth
 import fmdt.download
 import fmdt.res
-import shutil
-
-from fmdt.utils import join
+import fmdt.cache
 
 dirs = AppDirs("fmdt_python")
 config_file = "config.json"
@@ -226,7 +224,8 @@ def size_dir(start_path = '.'):
     return total_size
 
 def size_cache():
-    return size_dir(cache_dir())
+    """Return the size of the cache in bytes, as recorded in the cache index"""
+    return fmdt.cache.total_size()
 
 def bytes_format(x: int) -> str:
     """print 1024 as 1KB"""
@@ -249,51 +248,34 @@ def bytes_format(x: int) -> str:
 def clear_cache() -> int:
     """Return the total number of files and folders removed"""
 
-    cd = cache_dir()
-    paths = os.listdir(cd)
-    size_cache_init = size_cache()
-
-    files_removed = 0
-    top_level_dir_removed = 0
-
-    for p in paths:
-
-        full_path = join(cd, p)
-
-        if os.path.isfile(full_path):
-            os.remove(full_path)
-            files_removed += 1
-            continue
-
-        if os.path.isdir(full_path):
-            files_removed += count_files_in_dir(p)
-            top_level_dir_removed += 1
-            shutil.rmtree(full_path)
-            continue
-
-    print(f"{cache_dir()} cleared: {files_removed} total files and {top_level_dir_removed} top-level directories removed from cache ({bytes_format(size_cache_init - size_cache())} cleared)")
+    n_removed, freed = fmdt.cache.clear()
 
+    print(f"{cache_dir()} cleared: {n_removed} top-level files and directories removed from cache ({bytes_format(freed)} cleared)")
 
-_KB = 1024
-_MB = 1024 * _KB
-_GB = 1024 * _MB
+    return n_removed
 
-_CACHE_LIMIT_BYTES = 100 * _MB
+def set_cache_limits(high_bytes: int | None = None, low_bytes: int | None = None, policy: str | None = None) -> None:
+    """Set the size of the cache that triggers an eviction (high_bytes), the size the cache is
+    evicted down to (low_bytes) and the eviction policy ("lru" or "lfu")
 
+    Examples
+    --------
+    >>> fmdt.set_cache_limits(high_bytes=2 * 1024**3, low_bytes=1024**3, policy="lfu")
+    """
+    fmdt.cache.set_limits(high_bytes, low_bytes, policy)
 
 def init_cache() -> None:
     if not os.path.exists(cache_dir()):
-        os.mkdir(cache_dir())
+        os.makedirs(cache_dir())
 
-    if size_cache() > _CACHE_LIMIT_BYTES:
-        print(f"Cache reached maximum size! ({bytes_format(size_cache())})")
-        clear_cache()
+    fmdt.cache.init()
 
 def listdir_cache() -> list[str]:
-    return os.listdir(cache_dir())
+    return [f for f in os.listdir(cache_dir()) if not fmdt.cache.is_reserved(f)]
 
 def cache_info():
-    print(f"Cache: {cache_dir()} has {bytes_format(size_cache())}")
+    high, low, policy = fmdt.cache.get_limits()
+    print(f"Cache: {cache_dir()} has {bytes_format(size_cache())} in {fmdt.cache.n_entries()} entries (evicts {policy} down to {bytes_format(low)} above {bytes_format(high)})")
 
 def seagate():
     fmdt.init(
@@ -4,12 +4,24 @@ Core functions used in the processing of output for fmdt: https://github.com/als
 Public API:
     extract_key_information
     extract_all_information
+    write_tracks_file
+    Trajectory
+    read_detect_output
+    read_track_table
+    iter_tracks
+    parse_track_table
+    TrackTable
     split_video_at_meteors
 """
+import io
 import os
+import re
+import numpy as np
+import pandas as pd
 import fmdt.utils as utils
 from enum import Enum
 import math
+import operator
 from termcolor import colored
 
 red = lambda s: colored(s, "red")
@@ -49,7 +61,95 @@ class ObjectType(Enum):
 
 
 
-class TrackedObject:
+def _end_point(name: str) -> property:
+    """Property over the slot `_<name>` of a Trajectory. Setting it drops the derived quantities"""
+
+    slot = "_" + name
+
+    def set(self, value):
+        setattr(self, slot, value)
+        self._forget()
+
+    return property(operator.attrgetter(slot), set)
+
+class Trajectory:
+    """Straight line motion of an object from (start_x, start_y) at start_frame to (end_x, end_y) at end_frame
+
+    Base of TrackedObject and HumanDetection. Both are slotted, so they don't carry a `__dict__`,
+    and the quantities derived from the end points (direction, slope and per-frame velocity) are
+    computed on their first use and then kept, instead of on every call of the matching loops of
+    fmdt.truth. Setting an end point (as shift_tracks and VideoClip.meteors do) forgets them.
+    """
+
+    __slots__ = ("_start_frame", "_start_x", "_start_y", "_end_frame", "_end_x", "_end_y",
+                 "_direction", "_slope", "_velocity")
+
+    start_frame = _end_point("start_frame")
+    start_x = _end_point("start_x")
+    start_y = _end_point("start_y")
+    end_frame = _end_point("end_frame")
+    end_x = _end_point("end_x")
+    end_y = _end_point("end_y")
+
+    def _forget(self) -> None:
+        self._direction = None
+        self._slope = None
+        self._velocity = None
+
+    def delta_x(self) -> float:
+        """Displacement in the x_axis direction"""
+        return self._end_x - self._start_x
+
+    def delta_y(self) -> float:
+        """Displacement in the y direction"""
+        return self._end_y - self._start_y
+
+    def displacement(self) -> tuple[float, float]:
+        return (self.delta_x(), self.delta_y())
+
+    def lifetime(self) -> tuple[int, int]:
+        return (self._start_frame, self._end_frame)
+
+    def nframes_alive(self) -> int:
+        return self._end_frame - self._start_frame
+
+    def slope(self) -> float:
+
+        if self._slope is None:
+            delta_x = self.delta_x()
+            self._slope = float("inf") if delta_x == 0 else self.delta_y() / delta_x
+
+        return self._slope
+
+    def direction(self) -> float:
+        """Return the angle of the displacement vector of this meteor. Units are radians"""
+
+        if self._direction is None:
+            self._direction = math.atan2(self.delta_y(), self.delta_x())
+
+        return self._direction
+
+    def velocity(self) -> tuple[float, float]:
+        """Displacement per frame in the x and y directions"""
+
+        if self._velocity is None:
+            n = self.nframes_alive()
+            self._velocity = (self.delta_x() / n, self.delta_y() / n)
+
+        return self._velocity
+
+    def dx(self) -> float:
+        return self.velocity()[0]
+
+    def interpolate_pos(self, frame_n: int) -> tuple[float, float]:
+        f_prime = frame_n - self._start_frame
+        dx = self.dx()
+        xi = self._start_x + (dx * f_prime)
+        yi = self._start_y + (dx * self.slope()) * f_prime
+        return (xi, yi)
+
+
+class TrackedObject(Trajectory):
     """A `TrackedObject` is used to store the celestial objects detected by `fmdt-detect`
 
     If we call `fmdt-detect` and store the track results to a file with:
@@ -70,6 +170,9 @@ class TrackedObject:
     # -------||---------|--------|--------||---------|--------|--------||---------
        {tid} ||  {fbeg} | {xbeg} | {ybeg} ||  {fend} | {xend} | {yend} || {otype}
     """
+
+    __slots__ = ("id", "type")
+
     def __init__(
         self,
         id: int,
@@ -83,13 +186,14 @@ class TrackedObject:
         ):
 
         self.id = id
-        self.start_frame = start_frame
-        self.start_x = start_x
-        self.start_y = start_y
-        self.end_frame = end_frame
-        self.end_x = end_x
-        self.end_y = end_y
+        self._start_frame = start_frame
+        self._start_x = start_x
+        self._start_y = start_y
+        self._end_frame = end_frame
+        self._end_x = end_x
+        self._end_y = end_y
         self.type = type
+        self._forget()
 
     def is_meteor(self) -> bool:
         return self.type == ObjectType.METEOR
@@ -117,40 +221,97 @@ class TrackedObject:
         return f"<{self.type_str()} ({self.start_frame}, {self.end_frame})>"
 
 
-    def delta_x(self) -> float:
-        """Displacement in the x_axis direction"""
-        return self.end_x - self.start_x
+TRACK_DTYPE = np.dtype([
+    ("id",          np.int64),
+    ("start_frame", np.int64),
+    ("start_x",     np.float64),
+    ("start_y",     np.float64),
+    ("end_frame",   np.int64),
+    ("end_x",       np.float64),
+    ("end_y",       np.float64),
+    ("type",        np.int8)      # ObjectType.value
+])
 
-    def delta_y(self) -> float:
-        """Displacement in the y direction"""
-        return self.end_y - self.start_y
+_OBJECT_TYPES = tuple(ObjectType)
+_ITER_CHUNK = 4096
 
-    def displacement(self) -> tuple[float, float]:
-        return (self.delta_x(), self.delta_y())
+class TrackTable:
+    """The tracking table of a run of `fmdt-detect` held as contiguous NumPy columns
 
-    def lifetime(self) -> tuple[int, int]:
-        return (self.start_frame, self.end_frame)
+    Runs with `trk_all=True` can hold tens of thousands of star and noise tracks. A TrackTable
+    stores them in a single structured array (TRACK_DTYPE) instead of one TrackedObject per track,
+    so that filtering and statistics are vectorized:
 
-    def nframes_alive(self) -> int:
-        return self.end_frame - self.start_frame
+    >>> table = fmdt.core.read_track_table("tracks.txt")
+    >>> table.meteors()["end_frame"] - table.meteors()["start_frame"]
 
-    def slope(self) -> float:
-        if self.delta_x() == 0:
-            return float("inf")
-        return self.delta_y() / self.delta_x()
+    Indexing a TrackTable with an int builds the TrackedObject of that row, and iterating over it
+    yields TrackedObjects one at a time, so code written against list[TrackedObject] keeps working.
+    Indexing with a column name returns that column, and indexing with a slice or a boolean mask
+    returns a new TrackTable.
+    """
 
-    def direction(self) -> float:
-        """Return the angle of the displacement vector of this meteor. Units are radians"""
-        return math.atan2(self.delta_y(), self.delta_x())
+    def __init__(self, data: np.ndarray | None = None):
+        self.data = np.empty(0, dtype=TRACK_DTYPE) if data is None else data
 
-    def dx(self) -> float:
-        return self.delta_x() / self.nframes_alive()
+    @staticmethod
+    def from_list(trk_list: list[TrackedObject]) -> "TrackTable":
 
-    def interpolate_pos(self, frame_n: int) -> tuple[float, float]:
-        f_prime = frame_n - self.start_frame
-        xi = self.start_x + (self.dx() * f_prime)
-        yi = self.start_y + (self.dx() * self.slope()) * f_prime
-        return (xi, yi)
+        data = np.array([(t.id, t.start_frame, t.start_x, t.start_y, t.end_frame, t.end_x, t.end_y, t.type.value)
+                         for t in trk_list], dtype=TRACK_DTYPE)
+
+        return TrackTable(data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, key):
+
+        if isinstance(key, str):
+            return self.data[key]
+
+        if isinstance(key, (int, np.integer)):
+            return self._row(self.data[key])
+
+        return TrackTable(self.data[key])
+
+    def __iter__(self):
+        # Rows are converted to Python scalars a chunk at a time: one tolist() per row is much slower
+        for i in range(0, len(self.data), _ITER_CHUNK):
+            for row in self.data[i:i + _ITER_CHUNK].tolist():
+                yield TrackTable._make(row)
+
+    @staticmethod
+    def _row(row) -> TrackedObject:
+        return TrackTable._make(row.tolist())
+
+    @staticmethod
+    def _make(row: tuple) -> TrackedObject:
+        id, start_frame, start_x, start_y, end_frame, end_x, end_y, type = row
+        return TrackedObject(id, start_frame, start_x, start_y, end_frame, end_x, end_y, _OBJECT_TYPES[type])
+
+    def to_list(self) -> list[TrackedObject]:
+        return list(self)
+
+    def of_type(self, type: ObjectType) -> "TrackTable":
+        return self[self.data["type"] == type.value]
+
+    def meteors(self) -> "TrackTable":
+        return self.of_type(ObjectType.METEOR)
+
+    def stars(self) -> "TrackTable":
+        return self.of_type(ObjectType.STAR)
+
+    def noise(self) -> "TrackTable":
+        return self.of_type(ObjectType.NOISE)
+
+    def in_frames(self, start: int, stop: int) -> "TrackTable":
+        """Return the tracks alive at some point of the frames [start, stop]"""
+        return self[(self.data["start_frame"] <= stop) & (self.data["end_frame"] >= start)]
+
+    def __repr__(self) -> str:
+        counts = np.bincount(self.data["type"], minlength=len(ObjectType))
+        return f"<TrackTable {len(self)} tracks ({counts[0]} meteors, {counts[1]} stars, {counts[2]} noise)>"
 
 
 def read_tracks_file(tracks_filename: str) -> list[TrackedObject]:
@@ -195,30 +356,30 @@ def extract_key_information(detect_tracks_in: str) -> list[dict]:
     )
 
     # Processing of the actual file
-    file_tracks = open(detect_tracks_in)
-    file_lines  = file_tracks.readlines()
     dict_array = []
 
-    for line in file_lines:
-        if interesting_line(line):
-            dict_array.append(line_to_dict(line.split()))
+    with open(detect_tracks_in) as file_tracks:
+        for line in file_tracks:
+            if interesting_line(line):
+                dict_array.append(line_to_dict(line.split()))
 
     return dict_array
 
 def nframes_processed(detect_tracks_in: str) -> int:
+    """Return the number of frames processed by the run that wrote `detect_tracks_in`
+
+    Use read_detect_output instead when the tracks are needed as well, to read the file only once
+    """
 
     if not os.path.exists(detect_tracks_in):
         return 0
 
     with open(detect_tracks_in) as file:
+        for line in file:
+            if _PROCESSED_FRAMES in line:
+                return int(line.split()[-1])
 
-        lines = [l for l in file.readlines() if "-> Processed frames =" in l]
-        if len(lines) == 0:
-            return 0
-        line_split = lines[0].split()
-        out = int(line_split[-1])
-
-    return out
+    return 0
 
 
 def extract_all_information(detect_tracks_in: str) -> list[TrackedObject]:
@@ -246,44 +407,295 @@ def extract_all_information(detect_tracks_in: str) -> list[TrackedObject]:
         `fmdt-detect`
     """
 
-    # Utility function to convert a line of interest to a dictionary
-    # def line_to_dict(split_line: list[str]):
-
-    #     return {
-    #         "id":           int(split_line[TrackingTable.OBJECT_ID]),
-    #         "start_frame":  int(split_line[TrackingTable.START_FRAME]),
-    #         "start_x":      float(split_line[TrackingTable.START_X]),
-    #         "start_y":      float(split_line[TrackingTable.START_Y]),
-    #         "end_frame":    int(split_line[TrackingTable.END_FRAME]),
-    #         "end_x":        float(split_line[TrackingTable.END_X]),
-    #         "end_y":        float(split_line[TrackingTable.END_Y]),
-    #         "type":         split_line[TrackingTable.OBJECT_TYPE]
-    #     }
+    return read_track_table(detect_tracks_in).to_list()
+
+
+_TRACKS_HEADER = """# -------||---------------------------||---------------------------||---------
+#  Track ||           Begin           ||            End            ||  Object
+# -------||---------------------------||---------------------------||---------
+# -------||---------|--------|--------||---------|--------|--------||---------
+#     Id || Frame # |      x |      y || Frame # |      x |      y ||    Type
+# -------||---------|--------|--------||---------|--------|--------||---------
+"""
+
+def write_tracks_file(tracks_filename: str, trk_list: list[TrackedObject]) -> None:
+    """Write `trk_list` as a tracking table in the format of `fmdt-detect`, readable by `fmdt-check`
+    and read_tracks_file"""
+
+    with open(tracks_filename, "w") as file:
+        file.write(_TRACKS_HEADER)
+
+        for t in trk_list:
+            file.write(f"   {t.id:5d} || {t.start_frame:7d} | {t.start_x:6.1f} | {t.start_y:6.1f} || "
+                       f"{t.end_frame:7d} | {t.end_x:6.1f} | {t.end_y:6.1f} || {t.type_str().lower()}\n")
+
+_PROCESSED_FRAMES = "-> Processed frames ="
+_STAT_PREFIX = "# ->"
+_STAT_LINE = re.compile(r"#\s*->\s*(.+?)\s*=\s*(.*)$")
+
+def parse_track_line(line: str) -> TrackedObject | None:
+    """Convert a single line of the tracking table to a TrackedObject
+
+    Return None if the line is not a row of the tracking table
+    """
+    if not is_track_line(line):
+        return None
+
+    split_line = line.split()
+
+    return TrackedObject(int  (split_line[TrackingTable.OBJECT_ID]),
+                         int  (split_line[TrackingTable.START_FRAME]),
+                         float(split_line[TrackingTable.START_X]),
+                         float(split_line[TrackingTable.START_Y]),
+                         int  (split_line[TrackingTable.END_FRAME]),
+                         float(split_line[TrackingTable.END_X]),
+                         float(split_line[TrackingTable.END_Y]),
+                         ObjectType.from_str(split_line[TrackingTable.OBJECT_TYPE]))
+
+
+_TRACK_COLUMNS = [name for name in TRACK_DTYPE.names]
+_NO_PIPES = str.maketrans("|", " ")
+
+def is_track_line(line: str) -> bool:
+    return (" meteor" in line) or (" star" in line) or (" noise" in line)
+
+def _table_from_lines(lines: list[str]) -> TrackTable:
+    """Convert the rows of a tracking table to a TrackTable
+
+    The `|` separators are blanked out and the columns are converted by the C parser of pandas in a
+    single pass, instead of splitting and converting each line in Python.
+    """
+
+    if len(lines) == 0:
+        return TrackTable()
+
+    try:
+        df = pd.read_csv(io.StringIO("\n".join(lines).translate(_NO_PIPES)), sep=r"\s+", header=None,
+                         names=_TRACK_COLUMNS, dtype={"type": str})
+    except (ValueError, pd.errors.ParserError):
+        df = None
+
+    if df is None or df.isna().any(axis=None):
+        # A malformed row: fall back to parsing line by line
+        return TrackTable.from_list([parse_track_line(l) for l in lines])
+
+    data = np.empty(len(df), dtype=TRACK_DTYPE)
+
+    for name in _TRACK_COLUMNS[:-1]:
+        data[name] = df[name].to_numpy()
+
+    # Like ObjectType.from_str, anything that is neither a meteor nor a star is noise
+    types = df["type"].str.lower().to_numpy()
+    data["type"] = ObjectType.NOISE.value
+    data["type"][types == "meteor"] = ObjectType.METEOR.value
+    data["type"][types == "star"] = ObjectType.STAR.value
+
+    return TrackTable(data)
+
+def parse_track_table(text: str) -> TrackTable:
+    """Parse every row of the tracking table held in `text` (the stdout of `fmdt-detect`) at once"""
+    return _table_from_lines([l for l in text.splitlines() if is_track_line(l)])
+
+def parse_stat_line(line: str) -> tuple[str, object] | None:
+    """Convert a line of the statistics printed after the tracking table to a (key, value) pair
+
+    >>> parse_stat_line("# -> Processed frames =   33")
+    ('processed_frames', 33)
+    >>> parse_stat_line("# -> Detected tracks = ['meteor':   1, 'star':   0, 'noise':   0, 'total':   1]")
+    ('detected_tracks', {'meteor': 1, 'star': 0, 'noise': 0, 'total': 1})
+
+    Return None if the line is not a statistic
+    """
+    match = _STAT_LINE.match(line)
+
+    if match is None:
+        return None
+
+    key = "_".join(match.group(1).lower().split())
+    value = match.group(2).strip()
+
+    if value.startswith("[") and value.endswith("]"):
+        counts = {}
+
+        for item in value[1:-1].split(","):
+            name, _, count = item.partition(":")
+            counts[name.strip().strip("'")] = _stat_value(count.strip())
+
+        return (key, counts)
+
+    return (key, _stat_value(value))
+
+def _stat_value(value: str):
+
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+
+    return value
+
+class DetectOutput:
+    """Everything read from the output of `fmdt-detect` (a trk_path file or its stdout) in one pass
+
+    tracks (TrackTable): The tracking table
+    nframes (int): Number of frames processed, 0 when the run didn't get to print it
+    stats (dict): The statistics printed after the tracking table, for example
+        {"processed_frames": 33, "detected_tracks": {"meteor": 1, "star": 0, "noise": 0, "total": 1}}
+    """
+
+    def __init__(self, tracks: TrackTable, stats: dict):
+        self.tracks = tracks
+        self.stats = stats
+        self.nframes = stats.get("processed_frames", 0)
+
+    def trk_list(self) -> list[TrackedObject]:
+        return self.tracks.to_list()
+
+def parse_detect_output(text: str) -> DetectOutput:
+    """Sort the lines of `text` into track rows and statistics in a single pass, then convert the rows at once"""
+
+    rows = []
+    stats = {}
+
+    for line in text.splitlines():
+
+        if line.startswith(_STAT_PREFIX):
+            stat = parse_stat_line(line)
+
+            if not stat is None:
+                stats[stat[0]] = stat[1]
+
+        elif is_track_line(line):
+            rows.append(line)
+
+    return DetectOutput(_table_from_lines(rows), stats)
+
+def read_detect_output(detect_tracks_in: str) -> DetectOutput:
+    """Read the tracks, the number of processed frames and the statistics of a detect_tracks.txt file
+
+    The file is read once, replacing a call to both extract_all_information and nframes_processed.
+    A file that doesn't exist holds no tracks and 0 processed frames.
+    """
 
     if not os.path.exists(detect_tracks_in):
-        return []
-
-    def line_to_obj(split_line: list[str]) -> TrackedObject:
-        return TrackedObject(int  (split_line[TrackingTable.OBJECT_ID]),
-                             int  (split_line[TrackingTable.START_FRAME]),
-                             float(split_line[TrackingTable.START_X]),
-                             float(split_line[TrackingTable.START_Y]),
-                             int  (split_line[TrackingTable.END_FRAME]),
-                             float(split_line[TrackingTable.END_X]),
-                             float(split_line[TrackingTable.END_Y]),
-                             ObjectType.from_str(split_line[TrackingTable.OBJECT_TYPE]))
+        return DetectOutput(TrackTable(), {})
 
-    # Utility boolean function to extract only the important lines
-    interesting_line = lambda line: (
-        (" meteor" in line) or (" star" in line) or (" noise" in line)
-    )
+    with open(detect_tracks_in) as file:
+        return parse_detect_output(file.read())
 
-    # Processing of the actual file
-    file_tracks = open(detect_tracks_in)
-    file_lines  = file_tracks.readlines()
-    file_tracks.close()
+def read_track_table(detect_tracks_in: str) -> TrackTable:
+    """Read the tracking table of a detect_tracks.txt file as a TrackTable (empty if the file doesn't exist)"""
+    return read_detect_output(detect_tracks_in).tracks
+
+
+def _object_type(t: ObjectType | str) -> ObjectType:
+    """Like ObjectType.from_str, but raise a ValueError on a name that isn't an ObjectType instead of returning NOISE"""
+
+    if isinstance(t, ObjectType):
+        return t
+
+    names = [o.name.lower() for o in ObjectType]
+
+    if not isinstance(t, str) or not t.lower() in names:
+        raise ValueError(f"Unknown object type {t!r}, expected one of {names}")
+
+    return ObjectType.from_str(t)
+
+def iter_tracks(detect_tracks_in: str, types = None, frame_range: tuple[int, int] | None = None):
+    """Yield the TrackedObjects of a detect_tracks.txt file one at a time, reading it line by line
+
+    Memory use doesn't depend on the size of the file, and the rows filtered out are never kept.
+
+    Parameters
+    ----------
+    detect_tracks_in (str): The name of a file whose content is the output of fmdt-detect
+    types (ObjectType | str | list): Only yield the objects of these types. Default None (every type)
+    frame_range (tuple[int, int]): Only yield the objects alive at some point of the frames
+        [start, stop]. Default None (every frame)
+
+    Raises ValueError when a name of `types` is not "meteor", "star" or "noise"
+
+    Examples
+    --------
+    >>> for meteor in fmdt.core.iter_tracks("tracks.txt", types=fmdt.core.ObjectType.METEOR):
+    ...     print(meteor)
+    >>> n = sum(1 for _ in fmdt.core.iter_tracks("tracks.txt", types=["star", "noise"], frame_range=(1000, 2000)))
+    """
+
+    if isinstance(types, (ObjectType, str)):
+        types = [types]
+
+    if not types is None:
+        types = {_object_type(t) for t in types}
+
+    # Validated above, before the first row is requested
+    return _iter_tracks(detect_tracks_in, types, frame_range)
+
+def _iter_tracks(detect_tracks_in: str, types: set[ObjectType] | None, frame_range: tuple[int, int] | None):
+
+    if not os.path.exists(detect_tracks_in):
+        return
+
+    with open(detect_tracks_in) as file:
+        for line in file:
+            obj = parse_track_line(line)
+
+            if obj is None:
+                continue
+
+            if not types is None and not obj.type in types:
+                continue
+
+            if not frame_range is None and (obj.end_frame < frame_range[0] or obj.start_frame > frame_range[1]):
+                continue
+
+            yield obj
+
+
+class TrackParser:
+    """Incrementally parse the stdout of `fmdt-detect`, one line at a time
+
+    Used to read the tracking table while `fmdt-detect` is still running, without holding its
+    output in memory:
+
+    >>> parser = TrackParser(on_track=print)
+    >>> for line in proc.stdout:
+    ...     parser.feed(line)
+    >>> parser.trk_list, parser.nframes
+    """
+
+    def __init__(self, on_track = None):
+        """
+        Parameters
+        ----------
+        on_track (Callable[[TrackedObject], None]): Called with every TrackedObject as soon as its line is parsed
+        """
+        self.trk_list = []
+        self.nframes = 0
+        self.stats = {}
+        self.on_track = on_track
+
+    def feed(self, line: str) -> None:
+
+        if line.startswith(_STAT_PREFIX):
+            stat = parse_stat_line(line)
+
+            if not stat is None:
+                self.stats[stat[0]] = stat[1]
+                self.nframes = self.stats.get("processed_frames", 0)
+
+            return
+
+        obj = parse_track_line(line)
+
+        if obj is None:
+            return
+
+        self.trk_list.append(obj)
 
-    return [line_to_obj(line.split()) for line in file_lines if interesting_line(line)]
+        if not self.on_track is None:
+            self.on_track(obj)
 
 
 def split_video_at_meteors(
@@ -8,6 +8,7 @@ import fmdt.download
 import fmdt.utils
 import fmdt.res
 import fmdt.api
+import fmdt.core
 
 from copy import (
     deepcopy
@@ -19,6 +20,7 @@ import sqlite3
 from enum import Enum
 from termcolor import colored
 import os
+import tempfile
 from sys import exit
 
 VIDEOS_FILE = fmdt.config.dir() + "/videos.db"
@@ -446,7 +448,15 @@ class Video:
 
         return df["md5"].iloc[0]
 
-    def compute_trk_rate(self, **detect_args):
+    def compute_trk_rate(self, windowed: bool = False, **detect_args):
+        """Tracking rate of fmdt-detect with `detect_args` on this video
+
+        With `windowed=True`, only the frames around the meteors are detected (see evaluate_windowed)
+        """
+
+        if windowed:
+            args = fmdt.args.detect_args(self.full_path(), **detect_args)
+            return self.evaluate_windowed(args).trk_rate()
 
         c_res = self.detect(**detect_args).check()
         return c_res.trk_rate()
@@ -527,6 +537,85 @@ class Video:
 
         return fmdt.check(args.detect_args.trk_path, tmp_gt_file, stdout, verbose, args=args)
 
+    def evaluate_windowed(
+            self,
+            args: fmdt.Args,
+            meteors: list[fmdt.truth.HumanDetection] = None,
+            margin: int = fmdt.truth.WINDOW_MARGIN,
+            tmp_gt_file = "tmp_meteors.txt",
+            stdout: str = "check.txt",
+            max_workers: int | None = None,
+            verbose = False
+        ) -> fmdt.res.CheckResult:
+        """Evaluate `args` like evaluate_args, running fmdt-detect only on the frames around each meteor
+
+        A window of frames is derived from the interval of every meteor, extended by `margin` frames on
+        each side (see fmdt.truth.meteor_windows). Each window is detected with `vid_in_start` and
+        `vid_in_stop`, the windows are run in parallel (fmdt.detect_many) and their tracks, numbered like
+        the whole video (see fmdt.truth.shift_tracks), are merged into `args.detect_args.trk_path` and checked with fmdt-check.
+
+        Objects outside of the windows are never detected, so the false positives of a windowed
+        evaluation only cover the windows.
+
+        Parameters
+        ----------
+        args (fmdt.Args): The set of fmdt-detect parameters that we want to evaluate. `vid_in_start` and `vid_in_stop` are ignored
+        meteors (list[fmdt.HumanDetection]): The list of meteors in our ground truth. Default self.meteors()
+        margin (int): Number of frames detected before and after each meteor. Default fmdt.truth.WINDOW_MARGIN
+        max_workers (int): Maximum number of windows detected at the same time. Default os.cpu_count()
+
+        Examples
+        --------
+        >>> v = fmdt.load_draco12(require_gt=True)[0]
+        >>> v.evaluate_windowed(fmdt.detect_args(ccl_hyst_lo=200, ccl_hyst_hi=240)).trk_rate()
+        """
+
+        if meteors is None:
+            meteors = self.meteors()
+
+        trk_path = args.detect_args.trk_path
+
+        if trk_path is None:
+            trk_path = self.default_trk_path()
+
+        windows = fmdt.truth.meteor_windows(meteors, margin)
+        trk_list = []
+
+        with tempfile.TemporaryDirectory(prefix="fmdt_windows_") as work_dir:
+
+            jobs = {}
+
+            for (start, stop) in windows:
+                d_args = deepcopy(args.detect_args)
+                d_args.vid_in_path = self.full_path()
+                d_args.vid_in_start = start
+                d_args.vid_in_stop = stop
+                d_args.log_path = None
+                d_args.trk_path = fmdt.utils.join(work_dir, f"{self.prefix()}_{start}_trk.txt")
+                d_args.trk_roi_path = fmdt.utils.join(work_dir, f"{self.prefix()}_{start}_trk2roi.txt")
+
+                jobs[d_args.trk_path] = (d_args, start, stop)
+
+            for res in fmdt.api.detect_many([j[0] for j in jobs.values()], max_workers=max_workers,
+                                            timeout=args.timeout, verbose=verbose):
+
+                _, start, stop = jobs[res.args.detect_args.trk_path]
+
+                if not res.ok():
+                    fmdt.utils.stderr(f"WARNING: window [{start}, {stop}] of {self} {res.status}, its tracks may be incomplete")
+
+                trk_list += fmdt.truth.shift_tracks(res.trk_list, start)
+
+        trk_list.sort(key=lambda t: (t.start_frame, t.end_frame))
+
+        for (i, t) in enumerate(trk_list):
+            t.id = i + 1
+
+        fmdt.core.write_tracks_file(trk_path, trk_list)
+        fmdt.truth.save_meteors_file(tmp_gt_file, meteors)
+
+        return fmdt.check(trk_path, tmp_gt_file, stdout, verbose, args=args)
+
     def create_clip(self, start_frame: int, end_frame: int):
 
         valid_bounds = start_frame >= 0 and end_frame <= self.nb_frames()
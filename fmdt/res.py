@@ -6,6 +6,7 @@ import fmdt.args
 import fmdt.core
 import fmdt.truth
 
+from enum import Enum
 from fmdt.exceptions import *
 
 from fmdt.utils import (
@@ -33,7 +34,7 @@ class AbstractResult:
         if trk_path is None:
             raise TypeError(f"No trk_path stored in args field of {type(self)}, cannot retrieve list of TrackedObject")
 
-        return fmdt.core.extract_all_information(self.args.trk_path())
+        return fmdt.core.read_track_table(trk_path).to_list()
 
     def vid_path(self):
         raise AbstractResultError(f"vid_path not implemented for child {type(self)}")
@@ -238,6 +239,92 @@ def retrieve_log_df(log_path: str) -> pd.DataFrame:
         "std_dev": [0.0] + std_dev
     })
 
+class RunStatus(Enum):
+    """Outcome of an execution of `fmdt-detect`"""
+    OK      = 0
+    TIMEOUT = 1
+    FAILED  = 2
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+class ResourceUsage:
+    """Cost of an execution of an fmdt executable
+
+    user, sys and max_rss come from the rusage of the child process and are None on platforms
+    without os.wait4 (and for the coroutines of fmdt.aio).
+    """
+
+    def __init__(
+            self,
+            wall: float,
+            user: float | None = None,
+            sys: float | None = None,
+            max_rss: int | None = None,
+            nframes: int | None = None
+        ):
+        """
+        Parameters
+        ----------
+        wall (float): Wall-clock time in seconds
+        user (float): CPU time in seconds spent in user mode
+        sys (float): CPU time in seconds spent in the kernel
+        max_rss (int): Peak resident set size in bytes
+        nframes (int): Number of frames processed, used to derive the throughput
+        """
+        self.wall = wall
+        self.user = user
+        self.sys = sys
+        self.max_rss = max_rss
+        self.nframes = nframes
+
+    def cpu(self) -> float | None:
+        """Total CPU time (user + sys) in seconds"""
+
+        if self.user is None or self.sys is None:
+            return None
+
+        return self.user + self.sys
+
+    def fps(self) -> float | None:
+        """Frames processed per second of wall-clock time"""
+
+        if not self.nframes or self.wall <= 0:
+            return None
+
+        return self.nframes / self.wall
+
+    def to_dict(self) -> dict:
+
+        return {
+            "wall_time": self.wall,
+            "user_time": self.user,
+            "sys_time": self.sys,
+            "max_rss": self.max_rss,
+            "fps": self.fps()
+        }
+
+    def __str__(self) -> str:
+
+        s = f"wall {self.wall:.2f}s"
+
+        if not self.cpu() is None:
+            s += f", user {self.user:.2f}s, sys {self.sys:.2f}s"
+
+        if not self.max_rss is None:
+            s += f", max rss {self.max_rss / (1024 * 1024):.1f}MB"
+
+        if not self.fps() is None:
+            s += f", {self.fps():.1f} fps"
+
+        return s
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
 class DetectionResult(AbstractResult):
 
     def __init__(
@@ -246,14 +333,34 @@ class DetectionResult(AbstractResult):
             df: pd.DataFrame,
             args: fmdt.args.Args,
             trk_list: list[fmdt.core.TrackedObject],
-            video = None
+            video = None,
+            error: Exception | None = None,
+            status: RunStatus | None = None,
+            returncode: int | None = None,
+            usage: ResourceUsage | None = None
         ):
+        """
+        Parameters
+        ----------
+        status (RunStatus): RunStatus.TIMEOUT when fmdt-detect was stopped after `timeout` seconds, in which case
+            trk_list and nframes only hold what was printed before it was stopped. Default RunStatus.OK,
+            or RunStatus.FAILED when `error` is set
+        returncode (int): Exit code of fmdt-detect, None when it wasn't executed (for example on a cache hit)
+        usage (ResourceUsage): Cost of the execution of fmdt-detect, None when it wasn't executed
+        """
+
+        if status is None:
+            status = RunStatus.OK if error is None else RunStatus.FAILED
 
         self.nframes = nframes
         self.df = df
         self.args = args
         self.trk_list = trk_list
         self.video = video
+        self.error = error
+        self.status = status
+        self.returncode = returncode
+        self.usage = usage
 
     # ============================ ABC overrides ==============================
     def get_trk_list(self) -> list[fmdt.truth.TrackedObject]:
@@ -266,6 +373,24 @@ class DetectionResult(AbstractResult):
         """Return the command used to call this detect"""
         return self.args.command()
 
+    def ok(self) -> bool:
+        return self.status == RunStatus.OK
+
+    def elapsed(self) -> float | None:
+        """Wall-clock time in seconds spent running fmdt-detect"""
+        return None if self.usage is None else self.usage.wall
+
+    def max_rss(self) -> int | None:
+        """Peak resident set size of fmdt-detect in bytes"""
+        return None if self.usage is None else self.usage.max_rss
+
+    def timed_out(self) -> bool:
+        return self.status == RunStatus.TIMEOUT
+
+    def failed(self) -> bool:
+        """Return True if fmdt-detect exited with an error or the call raised an exception (stored in the `error` field)"""
+        return self.status == RunStatus.FAILED
+
     def n_meteors_detected(self) -> int:
         return len([m for m in self.trk_list if m.is_meteor()])
 
@@ -279,9 +404,12 @@ class DetectionResult(AbstractResult):
         return f"objects in trk_list: {self.n_meteors_detected()} meteor(s), {self.n_stars_detected()} star(s), {self.n_noise_detected()} noise"
 
     def __str__(self) -> str:
-        a = f"fmdt.res.DetectionResult with args digest: {self.args.detect_args.digest()[0:16]}"
+        a = f"fmdt.res.DetectionResult with args digest: {self.args.detect_args.digest()[0:16]} ({self.status})"
         b = f"\n{self.trk_list_summary()}"
 
+        if not self.usage is None:
+            b += f"\n{self.usage}"
+
         c = ""
         if not self.df is None:
             c = f"\n{str(self.df)}"
@@ -368,10 +496,12 @@ class LogParserResult(AbstractResult):
 
     def __init__(
             self,
-            args: fmdt.args.Args
+            args: fmdt.args.Args,
+            usage: ResourceUsage | None = None
         ):
 
         self.args = args
+        self.usage = usage
 
     def vid_path(self):
         return self.args.vid_in_path()
@@ -381,10 +511,12 @@ class VisuResult(AbstractResult):
 
     def __init__(
             self,
-            args: fmdt.args.Args
+            args: fmdt.args.Args,
+            usage: ResourceUsage | None = None
         ):
 
         self.args = args
+        self.usage = usage
 
     def vid_path(self):
         return self.args.vid_out_path()
@@ -396,8 +528,9 @@ def load_det_result(trk_path: str, log_path: str) -> DetectionResult:
     """Load a det_result object whose content is stored in trk_path and log_path"""
 
     if os.path.exists(trk_path):
-        trk_list = fmdt.core.extract_all_information(trk_path)
-        n_frames = fmdt.core.nframes_processed(trk_path)
+        output = fmdt.core.read_detect_output(trk_path)
+        trk_list = output.trk_list()
+        n_frames = output.nframes
     else:
         trk_list = []
         n_frames = 0
@@ -576,10 +709,11 @@ def load_check_stats(check_stdout: str) -> pd.DataFrame:
 
 class CheckResult(AbstractResult):
 
-    def __init__(self, gt_table: pd.DataFrame = None, stats: pd.DataFrame = None, args = None):
+    def __init__(self, gt_table: pd.DataFrame = None, stats: pd.DataFrame = None, args = None, usage: ResourceUsage | None = None):
         self.gt_table = gt_table
         self.stats = stats
         self.args = args
+        self.usage = usage
 
     def __str__(self) -> str:
         a = "GroundTruth table\n-----------------\n"
@@ -0,0 +1,272 @@
+"""Admission control for batches of concurrent `fmdt-detect` processes
+
+Every run of `fmdt-detect` decodes its video with `vid_in_threads` threads, so running one process
+per core quickly oversubscribes a machine. A Scheduler hands out a budget of cores: a job is only
+started once the cores it needs are free, and it can optionally be pinned to those cores.
+
+With `vid_in_buff=True`, `fmdt-detect` holds the whole video in memory. A Scheduler with a memory
+budget estimates the footprint of every job from the dimensions of its video and queues the jobs
+that don't fit.
+
+>>> sched = fmdt.Scheduler(cores=32, pin=True, memory=64 * 2**30)
+>>> results = list(fmdt.detect_many(args, scheduler=sched))
+>>> print(sched.report())
+"""
+import os
+import time
+import threading
+import contextlib
+import fmdt.args
+import fmdt.utils
+
+from fmdt.utils import stderr
+
+_MB = 1024 * 1024
+
+# Memory model of a run of fmdt-detect, in bytes. Compare the estimates with the peak RSS
+# reported by Scheduler.memory_table() to calibrate it for your videos.
+BASE_BYTES = 64 * _MB
+BYTES_PER_PIXEL = 32         # working buffers of the current frame (images, labels, ROIs)
+BUFFERED_BYTES_PER_PIXEL = 1 # 8-bit grayscale frames held in memory with vid_in_buff
+
+# (abspath, mtime_ns) -> (width, height, nb_frames)
+_SHAPES = {}
+
+def video_shape(vid_in_path: str) -> tuple[int, int, int]:
+    """Memoized fmdt.utils.get_video_shape"""
+
+    key = (os.path.abspath(vid_in_path), os.stat(vid_in_path).st_mtime_ns)
+
+    if not key in _SHAPES:
+        _SHAPES[key] = fmdt.utils.get_video_shape(vid_in_path)
+
+    return _SHAPES[key]
+
+def estimate_memory(d_args: fmdt.args.DetectArgs) -> int:
+    """Estimate the peak memory in bytes of a run of `fmdt-detect` with the configuration `d_args`"""
+
+    width, height, nb_frames = video_shape(d_args.vid_in_path)
+    pixels = width * height
+
+    estimate = BASE_BYTES + pixels * BYTES_PER_PIXEL
+
+    if d_args.vid_in_buff:
+        start = 0 if d_args.vid_in_start is None else d_args.vid_in_start
+        stop = nb_frames if not d_args.vid_in_stop else min(d_args.vid_in_stop, nb_frames)
+
+        estimate += pixels * max(stop - start, 1) * BUFFERED_BYTES_PER_PIXEL
+
+    return estimate
+
+def available_cpus() -> list[int]:
+    """Return the ids of the CPUs this process is allowed to run on"""
+
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    else:
+        return list(range(os.cpu_count() or 1))
+
+class Scheduler:
+    """Admit `fmdt-detect` jobs against a budget of cores.
+
+    A job needs `vid_in_threads` cores. Jobs that leave `vid_in_threads` unset (or at 0, letting
+    ffmpeg choose) are counted as a single core, and a job that needs more than the whole budget
+    is admitted alone.
+
+    When a memory budget is given, a job also needs the memory returned by estimate_memory, and
+    a job estimated above the whole budget is admitted alone.
+    """
+
+    def __init__(
+            self,
+            cores: int | None = None,
+            pin: bool = False,
+            cpus: list[int] | None = None,
+            memory: int | None = None
+        ):
+        """
+        Parameters
+        ----------
+        cores (int): Number of cores that the running jobs may use at the same time. Default len(cpus)
+        pin (bool): When True, restrict each job to its own set of CPUs (Linux only). Default False
+        cpus (list[int]): CPUs to schedule jobs on. Default every CPU available to this process
+        memory (int): Number of bytes that the running jobs may use at the same time. Default None (no limit)
+        """
+
+        self.cpus = available_cpus() if cpus is None else sorted(cpus)
+        self.cores = len(self.cpus) if cores is None else cores
+
+        assert self.cores > 0, "A Scheduler needs at least one core"
+
+        if pin and not hasattr(os, "sched_setaffinity"):
+            stderr("CPU pinning is not supported on this platform, jobs will not be pinned")
+            pin = False
+
+        self.pin = pin
+        self.memory = memory
+
+        self._cond = threading.Condition()
+        self._free_cpus = list(self.cpus)
+        self._used = 0
+        self._used_memory = 0
+        self._peak_memory = 0
+        self._memory_log = []
+        self._peak = 0
+        self._n_jobs = 0
+        self._busy_core_seconds = 0.0
+        self._first_start = None
+        self._last_end = None
+
+    def cores_for(self, d_args: fmdt.args.DetectArgs) -> int:
+        """Number of cores of the budget reserved for a run of `d_args`"""
+
+        threads = d_args.vid_in_threads
+
+        if threads is None or threads < 1:
+            return 1
+
+        return min(threads, self.cores)
+
+    def memory_for(self, d_args: fmdt.args.DetectArgs) -> int:
+        """Number of bytes of the memory budget reserved for a run of `d_args` (0 without a memory budget)"""
+
+        if self.memory is None:
+            return 0
+
+        try:
+            estimate = estimate_memory(d_args)
+        except Exception as err:
+            stderr(f"Could not probe {d_args.vid_in_path} ({err}), assuming {BASE_BYTES // _MB}MB")
+            estimate = BASE_BYTES
+
+        return min(estimate, self.memory)
+
+    def acquire(self, n: int, memory: int = 0) -> list[int]:
+        """Block until `n` cores and `memory` bytes are free and reserve them
+
+        Return
+        ------
+        The CPUs reserved for the job when pinning, otherwise an empty list
+        """
+        def fits() -> bool:
+            if self._used + n > self.cores:
+                return False
+
+            return self.memory is None or self._used_memory + memory <= self.memory
+
+        with self._cond:
+            self._cond.wait_for(fits)
+
+            self._used += n
+            self._used_memory += memory
+            self._peak = max(self._peak, self._used)
+            self._peak_memory = max(self._peak_memory, self._used_memory)
+            self._n_jobs += 1
+
+            if self._first_start is None:
+                self._first_start = time.monotonic()
+
+            if not self.pin:
+                return []
+
+            # With a budget larger than the CPU set, some jobs run unpinned
+            cpus = self._free_cpus[0:n]
+            del self._free_cpus[0:len(cpus)]
+
+            return cpus
+
+    def release(self, n: int, cpus: list[int], started: float, memory: int = 0) -> None:
+
+        with self._cond:
+            now = time.monotonic()
+
+            self._used -= n
+            self._used_memory -= memory
+            self._busy_core_seconds += n * (now - started)
+            self._last_end = now
+            self._free_cpus = sorted(self._free_cpus + cpus)
+
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, d_args: fmdt.args.DetectArgs):
+        """Context manager that holds the cores needed by `d_args` while a job runs.
+
+        When the scheduler pins jobs, the calling thread is restricted to the reserved CPUs for the
+        duration of the block, so that any process it spawns (such as `fmdt-detect`) inherits them.
+        """
+
+        n = self.cores_for(d_args)
+        memory = self.memory_for(d_args)
+        cpus = self.acquire(n, memory)
+        started = time.monotonic()
+        previous = None
+
+        try:
+            if len(cpus) > 0:
+                previous = os.sched_getaffinity(0)
+                os.sched_setaffinity(0, cpus)
+
+            yield cpus
+
+        finally:
+            if not previous is None:
+                os.sched_setaffinity(0, previous)
+
+            self.release(n, cpus, started, memory)
+
+    def record(self, d_args: fmdt.args.DetectArgs, max_rss: int | None) -> None:
+        """Store the peak RSS measured for a job next to its memory estimate"""
+
+        if self.memory is None or max_rss is None:
+            return
+
+        with self._cond:
+            self._memory_log.append({
+                "video": d_args.vid_in_path,
+                "vid_in_buff": bool(d_args.vid_in_buff),
+                "estimate": self.memory_for(d_args),
+                "max_rss": max_rss
+            })
+
+    def memory_table(self) -> list[dict]:
+        """Return the (video, vid_in_buff, estimate, max_rss) of every job run with a memory budget"""
+        return list(self._memory_log)
+
+    def in_use(self) -> int:
+        """Number of cores currently reserved by running jobs"""
+        return self._used
+
+    def utilization(self) -> float:
+        """Fraction of the core budget that was reserved between the first job start and the last job end"""
+
+        if self._first_start is None or self._last_end is None:
+            return 0.0
+
+        window = self._last_end - self._first_start
+
+        if window <= 0:
+            return 0.0
+
+        return self._busy_core_seconds / (self.cores * window)
+
+    def report(self) -> str:
+
+        s = f"Scheduler: {self._n_jobs} job(s) on a budget of {self.cores} core(s)"
+        s += f"{' (pinned)' if self.pin else ''}\n"
+        s += f"    peak cores in use: {self._peak}\n"
+        s += f"    busy core-seconds: {self._busy_core_seconds:.1f}\n"
+        s += f"    utilization:       {100 * self.utilization():.1f}%"
+
+        if not self.memory is None:
+            s += f"\n    peak memory reserved: {self._peak_memory / _MB:.0f}MB of {self.memory / _MB:.0f}MB"
+
+            ratios = [j["max_rss"] / j["estimate"] for j in self._memory_log if j["estimate"] > 0]
+
+            if len(ratios) > 0:
+                s += f"\n    peak RSS / estimate:  {sum(ratios) / len(ratios):.2f} (mean), {max(ratios):.2f} (max)"
+
+        return s
+
+    def __str__(self) -> str:
+        return self.report()
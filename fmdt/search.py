@@ -0,0 +1,495 @@
+"""Adaptive search of `fmdt-detect` parameters
+
+Every trial of a search is a full run of `fmdt-detect` followed by `fmdt-check`, so the number of
+trials is what a tuning session costs. Instead of a linear grid, `search` uses a Tree-structured
+Parzen Estimator (TPE) for every video: the first trials are drawn at random, then the trials are
+split between the best `gamma` fraction and the rest, and new candidates are taken where the
+density of good trials is high compared to the density of bad ones. The objective is the tracking
+rate reported by `fmdt-check` (CheckResult.trk_rate()).
+
+>>> space = [fmdt.search.Param("ccl_hyst_lo", 150, 255), fmdt.search.Param("ccl_hyst_hi", 150, 255)]
+>>> trials = fmdt.search.search(fmdt.load_draco6(require_gt=True), space, n_trials=40, best_csv="best_d6.csv")
+
+Public API:
+    Param
+    TPE
+    search
+    best_detections
+    successive_halving
+"""
+import os
+import copy
+import math
+import tempfile
+import numpy as np
+import pandas as pd
+import fmdt.api
+import fmdt.args
+import fmdt.db
+import fmdt.res
+import fmdt.truth
+import fmdt.utils
+
+from fmdt.utils import stderr
+
+# Smallest kernel width, as a fraction of a parameter's range
+_MIN_BANDWIDTH = 0.02
+# Weight of the (wide) prior component of every Parzen estimator, relative to one observation
+_PRIOR_WEIGHT = 1.0
+
+class Param:
+    """Range [low, high] of a DetectArgs parameter. The parameter is an integer when both bounds are ints"""
+
+    def __init__(self, name: str, low: int | float, high: int | float):
+
+        assert low < high, f"Empty range [{low}, {high}] for {name}"
+
+        self.name = name
+        self.low = low
+        self.high = high
+
+    def is_int(self) -> bool:
+        return isinstance(self.low, int) and isinstance(self.high, int)
+
+    def to_unit(self, x: int | float) -> float:
+        """Map a value of [low, high] to [0, 1]"""
+        return (x - self.low) / (self.high - self.low)
+
+    def from_unit(self, u: float) -> int | float:
+        """Map a value of [0, 1] back to [low, high]"""
+
+        x = self.low + min(max(u, 0.0), 1.0) * (self.high - self.low)
+
+        if self.is_int():
+            return int(round(x))
+
+        return float(x)
+
+    def __repr__(self) -> str:
+        return f"Param({self.name}, {self.low}, {self.high})"
+
+DEFAULT_SPACE = [Param("ccl_hyst_lo", 150, 255), Param("ccl_hyst_hi", 150, 255)]
+
+def _parzen(x: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Gaussian mixture (means, widths, weights) centered on the points `x` of [0, 1], plus a wide prior"""
+
+    n = len(x)
+    bandwidth = 1.06 * np.std(x) * n ** (-1 / 5) if n > 1 else 0.0
+    bandwidth = min(max(bandwidth, _MIN_BANDWIDTH), 1.0)
+
+    mus = np.append(x, 0.5)
+    sigmas = np.append(np.full(n, bandwidth), 1.0)
+    weights = np.append(np.ones(n), _PRIOR_WEIGHT)
+
+    return mus, sigmas, weights / weights.sum()
+
+def _log_density(u: np.ndarray, mixture: tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+
+    mus, sigmas, weights = mixture
+
+    z = (u[:, None] - mus[None, :]) / sigmas[None, :]
+    log_p = np.log(weights)[None, :] - 0.5 * z ** 2 - np.log(sigmas * math.sqrt(2 * math.pi))[None, :]
+    top = log_p.max(axis=1)
+
+    return top + np.log(np.exp(log_p - top[:, None]).sum(axis=1))
+
+class TPE:
+    """Tree-structured Parzen Estimator that proposes points of a space and maximizes their score
+
+    The parameters are modeled independently of each other, as in the original TPE.
+
+    >>> tpe = TPE([Param("ccl_hyst_lo", 150, 255)], seed=0)
+    >>> for params in tpe.ask(4):
+    ...     tpe.tell(params, objective(params))
+    """
+
+    def __init__(
+            self,
+            space: list[Param],
+            gamma: float = 0.25,
+            n_startup: int = 10,
+            n_candidates: int = 24,
+            seed: int | None = None,
+            normalize = None
+        ):
+        """
+        Parameters
+        ----------
+        space (list[Param]): Parameters to search
+        gamma (float): Fraction of the trials considered good. Default 0.25
+        n_startup (int): Number of random trials before the estimator is used. Default 10
+        n_candidates (int): Number of candidates drawn from the good density for every proposal. Default 24
+        seed (int): Seed of the random generator. Default None
+        normalize (Callable[[dict], dict]): Applied to every proposal before it is compared with the points
+            already tried, for example to keep two parameters ordered. Default None
+        """
+
+        self.space = space
+        self.gamma = gamma
+        self.n_startup = n_startup
+        self.n_candidates = n_candidates
+        self.rng = np.random.default_rng(seed)
+        self.normalize = normalize
+        self.trials = []
+
+    def _key(self, params: dict) -> tuple:
+        return tuple(params[p.name] for p in self.space)
+
+    def tell(self, params: dict, score: float) -> None:
+        """Record the score of a point returned by ask()"""
+        self.trials.append((dict(params), score))
+
+    def ask(self, n: int = 1) -> list[dict]:
+        """Propose up to `n` distinct points that haven't been tried yet
+
+        Fewer points are returned when no new point could be found (a small integer space is exhausted).
+        """
+
+        seen = set(self._key(p) for p, _ in self.trials)
+        out = []
+
+        if len(self.trials) < self.n_startup:
+            u = self.rng.random((n * self.n_candidates, len(self.space)))
+        else:
+            u = self._candidates(n * self.n_candidates)
+
+        for row in u:
+            params = {p.name: p.from_unit(x) for p, x in zip(self.space, row)}
+
+            if not self.normalize is None:
+                params = self.normalize(params)
+
+            key = self._key(params)
+
+            if not key in seen:
+                seen.add(key)
+                out.append(params)
+
+            if len(out) == n:
+                break
+
+        return out
+
+    def _candidates(self, n: int) -> np.ndarray:
+        """Draw `n` points from the good density, sorted by decreasing l(x) / g(x)"""
+
+        scores = np.array([s for _, s in self.trials])
+        order = np.argsort(-scores, kind="stable")
+        n_good = max(1, int(math.ceil(self.gamma * len(self.trials))))
+
+        good = [self.trials[i][0] for i in order[0:n_good]]
+        bad = [self.trials[i][0] for i in order[n_good:]]
+
+        u = np.empty((n, len(self.space)))
+        ratio = np.zeros(n)
+
+        for j, p in enumerate(self.space):
+            l = _parzen(np.array([p.to_unit(t[p.name]) for t in good]))
+            g = _parzen(np.array([p.to_unit(t[p.name]) for t in bad]))
+
+            mus, sigmas, weights = l
+            component = self.rng.choice(len(mus), size=n, p=weights)
+            u[:, j] = np.clip(self.rng.normal(mus[component], sigmas[component]), 0.0, 1.0)
+
+            ratio += _log_density(u[:, j], l) - _log_density(u[:, j], g)
+
+        return u[np.argsort(-ratio, kind="stable")]
+
+    def best(self) -> tuple[dict, float] | None:
+        """Return the (params, score) of the best trial so far"""
+
+        if len(self.trials) == 0:
+            return None
+
+        return max(self.trials, key=lambda t: t[1])
+
+def _ordered(params: dict) -> dict:
+    """Keep the hysteresis thresholds ordered (ccl_hyst_lo <= ccl_hyst_hi)"""
+
+    if "ccl_hyst_lo" in params and "ccl_hyst_hi" in params and params["ccl_hyst_lo"] > params["ccl_hyst_hi"]:
+        params["ccl_hyst_lo"], params["ccl_hyst_hi"] = params["ccl_hyst_hi"], params["ccl_hyst_lo"]
+
+    return params
+
+def _trial_args(
+        base_args: fmdt.args.DetectArgs,
+        video: fmdt.db.Video,
+        params: dict,
+        work_dir: str,
+        tag: str
+    ) -> fmdt.args.DetectArgs:
+    """Copy of `base_args` that detects `video` with `params` and writes its tracks to `work_dir`"""
+
+    d_args = copy.deepcopy(base_args)
+    d_args.vid_in_path = video.full_path()
+    d_args.log_path = None
+
+    for (k, val) in params.items():
+        setattr(d_args, k, val)
+
+    d_args.trk_path = fmdt.utils.join(work_dir, f"{video.prefix()}_{tag}_trk.txt")
+    d_args.trk_roi_path = fmdt.utils.join(work_dir, f"{video.prefix()}_{tag}_trk2roi.txt")
+
+    return d_args
+
+def _evaluate(
+        res: fmdt.res.DetectionResult,
+        video: fmdt.db.Video,
+        meteors: list[fmdt.truth.HumanDetection]
+    ) -> tuple[float, int]:
+    """Score a finished detection with Video.evaluate_args and remove its files
+
+    Return
+    ------
+    The (trk_rate, true positives) of the detection. Detections that didn't complete score 0
+    """
+
+    trk_path = res.args.detect_args.trk_path
+    gt_path = trk_path + ".gt"
+    stdout = trk_path + ".check"
+
+    trk_rate, tpos = 0.0, 0
+
+    if res.ok():
+        try:
+            # The tracks file exists, so evaluate_args only runs fmdt-check
+            c_res = video.evaluate_args(res.args, meteors, tmp_gt_file=gt_path, stdout=stdout)
+            trk_rate, tpos = c_res.trk_rate(), int(c_res.true_pos())
+        except Exception as err:
+            stderr(f"fmdt-check failed for {trk_path}: {err}")
+
+    if trk_rate is None or np.isnan(trk_rate):
+        trk_rate = 0.0
+
+    for f in [trk_path, res.args.detect_args.trk_roi_path, gt_path, stdout]:
+        if not f is None and os.path.exists(f):
+            os.remove(f)
+
+    return float(trk_rate), tpos
+
+def search(
+        videos: list[fmdt.db.Video],
+        space: list[Param] | None = None,
+        n_trials: int = 32,
+        batch_size: int | None = None,
+        base_args: fmdt.args.DetectArgs | None = None,
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        gamma: float = 0.25,
+        n_startup: int = 10,
+        seed: int | None = None,
+        best_csv: str | None = None,
+        verbose: bool = False
+    ) -> pd.DataFrame:
+    """Search the parameters of `space` that maximize the tracking rate of every video of `videos`
+
+    Each video has its own TPE. Trials are proposed in rounds of `batch_size` per video and every round
+    is detected in parallel with fmdt.detect_many, then scored by Video.evaluate_args against the meteors
+    of the video.
+
+    Parameters
+    ----------
+    videos (list[fmdt.db.Video]): Videos with a ground truth (Video.meteors())
+    space (list[Param]): Parameters to search. Default ccl_hyst_lo and ccl_hyst_hi in [150, 255]
+    n_trials (int): Number of trials per video. Default 32
+    batch_size (int): Number of trials per video detected in the same round. Default max(1, n_startup // 2)
+    base_args (fmdt.args.DetectArgs): Values of the parameters that are not searched. Default fmdt-detect's defaults
+    max_workers (int): Forwarded to fmdt.detect_many
+    timeout (float): Timeout of every trial, trials that time out score 0. Default None
+    gamma, n_startup, seed: Forwarded to TPE
+    best_csv (str): When given, write the best trial of every video to this file (see best_detections)
+    verbose (bool): Print the result of every trial. Default False
+
+    Return
+    ------
+    A DataFrame with one row per trial: video_name, trial, the searched parameters, status, n_Tpos and trk_rate
+    """
+
+    if space is None:
+        space = DEFAULT_SPACE
+
+    if base_args is None:
+        base_args = fmdt.args.DetectArgs(vid_in_path=None)
+
+    if batch_size is None:
+        batch_size = max(1, n_startup // 2)
+
+    rng = np.random.default_rng(seed)
+    # Proposals are ordered before the TPE checks them against the trials, which hold ordered points
+    tpes = {v.name: TPE(space, gamma, n_startup, seed=int(rng.integers(2**32)), normalize=_ordered) for v in videos}
+    n_done = {v.name: 0 for v in videos}
+    rows = []
+
+    with tempfile.TemporaryDirectory(prefix="fmdt_search_") as work_dir:
+
+        meteors = {v.name: v.meteors() for v in videos}
+
+        while True:
+
+            jobs = []
+            trials = {}
+
+            for v in videos:
+                n = min(batch_size, n_trials - n_done[v.name])
+
+                for params in tpes[v.name].ask(n):
+                    trial = n_done[v.name]
+                    n_done[v.name] += 1
+
+                    d_args = _trial_args(base_args, v, params, work_dir, str(trial))
+                    jobs.append(d_args)
+                    trials[d_args.trk_path] = (v, trial, params)
+
+            if len(jobs) == 0:
+                break
+
+            for res in fmdt.api.detect_many(jobs, max_workers=max_workers, timeout=timeout):
+
+                v, trial, params = trials[res.args.detect_args.trk_path]
+
+                trk_rate, tpos = _evaluate(res, v, meteors[v.name])
+                tpes[v.name].tell(params, trk_rate)
+
+                rows.append({"video_name": v.name, "trial": trial, **params, "status": str(res.status),
+                             "n_Tpos": tpos, "trk_rate": trk_rate})
+
+                if verbose:
+                    print(f"{v.name} trial {trial}: {params} -> trk_rate {trk_rate:.3f} ({tpos} true positive(s))")
+
+    df = pd.DataFrame(rows)
+
+    if not best_csv is None:
+        best_detections(df, base_args).to_csv(best_csv, index=False)
+
+    return df
+
+def best_detections(trials: pd.DataFrame, base_args: fmdt.args.DetectArgs | None = None) -> pd.DataFrame:
+    """Select the best trial of every video and format it like the best_detections csv files (data/best_d6.csv)
+
+    The columns are video_name, lmin, lmax, n_Tpos and trk_rate, followed by any other searched parameter.
+    Ties on trk_rate are broken by the number of true positives. Thresholds that were not searched are
+    taken from `base_args`.
+    """
+
+    searched = [c for c in trials.columns if not c in ["video_name", "trial", "status", "n_Tpos", "trk_rate"]]
+    best = trials.sort_values(["trk_rate", "n_Tpos"], ascending=False, kind="stable").groupby("video_name", sort=False).head(1)
+
+    out = pd.DataFrame({"video_name": best["video_name"]})
+
+    for col, param in [("lmin", "ccl_hyst_lo"), ("lmax", "ccl_hyst_hi")]:
+        if param in best.columns:
+            out[col] = best[param]
+        else:
+            out[col] = None if base_args is None else getattr(base_args, param)
+
+    out["n_Tpos"] = best["n_Tpos"]
+    out["trk_rate"] = best["trk_rate"]
+
+    for c in searched:
+        if not c in ["ccl_hyst_lo", "ccl_hyst_hi"]:
+            out[c] = best[c]
+
+    return out.sort_values("video_name").reset_index(drop=True)
+
+def successive_halving(
+        candidates: list[fmdt.args.DetectArgs],
+        videos: list[fmdt.db.Video],
+        eta: int = 3,
+        min_videos: int = 1,
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        verbose: bool = False
+    ) -> pd.DataFrame:
+    """Race `candidates` over `videos`, discarding the worst ones before they are run on every video
+
+    All the candidates are first evaluated on the `min_videos` first videos. After every rung only the
+    best 1 / `eta` of them (by mean tracking rate over the videos seen so far) survive, and the survivors
+    are evaluated on `eta` times as many videos. The last survivors are evaluated on every video.
+    Scores of a rung are reused by the next ones, so a (candidate, video) pair is only detected once.
+
+    Each evaluation is a detection run in parallel with fmdt.detect_many, scored by Video.evaluate_args
+    (CheckResult.trk_rate()). The order of `videos` matters: put the most representative ones first.
+
+    Parameters
+    ----------
+    candidates (list[fmdt.args.DetectArgs]): Configurations to compare. `vid_in_path` and the output paths are overwritten
+    videos (list[fmdt.db.Video]): Videos with a ground truth (Video.meteors())
+    eta (int): Inverse of the fraction of candidates kept after every rung. Default 3
+    min_videos (int): Number of videos of the first rung. Default 1
+    max_workers (int): Forwarded to fmdt.detect_many
+    timeout (float): Timeout of every detection, detections that time out score 0. Default None
+    verbose (bool): Print a summary of every rung. Default False
+
+    Return
+    ------
+    A DataFrame with one row per candidate, best first: `candidate` (index in `candidates`), `n_videos` (number of videos
+    it was evaluated on), `trk_rate` (mean over those videos), `n_Tpos` (total true positives) and `survivor`
+    (True for the candidates evaluated on every video)
+
+    Examples
+    --------
+    >>> candidates = [fmdt.DetectArgs(vid_in_path=None, ccl_hyst_lo=lo, ccl_hyst_hi=hi) for lo in range(150, 250, 10) for hi in range(lo, 255, 10)]
+    >>> ranking = fmdt.search.successive_halving(candidates, fmdt.load_draco6(require_gt=True), timeout=60)
+    >>> best = candidates[ranking["candidate"][0]]
+    """
+
+    assert eta > 1, "successive_halving needs eta > 1"
+    assert len(videos) > 0 and len(candidates) > 0, "successive_halving needs at least one video and one candidate"
+
+    # candidate -> video name -> (trk_rate, true positives)
+    scores = {i: {} for i in range(len(candidates))}
+    meteors = {v.name: v.meteors() for v in videos}
+
+    def mean_trk_rate(i: int) -> float:
+        return float(np.mean([r for r, _ in scores[i].values()]))
+
+    alive = list(range(len(candidates)))
+    n_videos = min(max(min_videos, 1), len(videos))
+    n_detections = 0
+
+    with tempfile.TemporaryDirectory(prefix="fmdt_halving_") as work_dir:
+
+        while True:
+
+            jobs = []
+            pairs = {}
+
+            for i in alive:
+                for v in videos[0:n_videos]:
+                    if not v.name in scores[i]:
+                        d_args = _trial_args(candidates[i], v, {}, work_dir, str(i))
+                        jobs.append(d_args)
+                        pairs[d_args.trk_path] = (i, v)
+
+            for res in fmdt.api.detect_many(jobs, max_workers=max_workers, timeout=timeout):
+                i, v = pairs[res.args.detect_args.trk_path]
+                scores[i][v.name] = _evaluate(res, v, meteors[v.name])
+
+            n_detections += len(jobs)
+
+            ranked = sorted(alive, key=mean_trk_rate, reverse=True)
+
+            if verbose:
+                print(f"Rung with {n_videos} video(s): {len(alive)} candidate(s), best mean trk_rate {mean_trk_rate(ranked[0]):.3f}")
+
+            if n_videos == len(videos):
+                break
+
+            alive = ranked[0:max(1, math.ceil(len(alive) / eta))]
+            # A single survivor doesn't need intermediate rungs
+            n_videos = len(videos) if len(alive) == 1 else min(n_videos * eta, len(videos))
+
+    if verbose:
+        print(f"successive_halving: {n_detections} detection(s) instead of {len(candidates) * len(videos)}")
+
+    rows = [{
+        "candidate": i,
+        "n_videos": len(scores[i]),
+        "trk_rate": mean_trk_rate(i) if len(scores[i]) > 0 else 0.0,
+        "n_Tpos": sum([t for _, t in scores[i].values()]),
+        "survivor": i in alive
+    } for i in range(len(candidates))]
+
+    df = pd.DataFrame(rows, columns=["candidate", "n_videos", "trk_rate", "n_Tpos", "survivor"])
+
+    return df.sort_values(["n_videos", "trk_rate", "n_Tpos"], ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,241 @@
+"""Resumable parameter sweeps over `fmdt-detect`
+
+A sweep is a named list of DetectArgs. Every completed point is written to a SQLite store as
+soon as its detection finishes, keyed by (sweep, video, DetectArgs.cache_key()). Running the same
+sweep again skips the points that are already in the store, so an interrupted sweep picks up
+where it stopped instead of starting over.
+
+>>> args = [fmdt.DetectArgs(vid_in_path=v.full_path(), ccl_hyst_lo=lo, ccl_hyst_hi=lo + 5)
+...         for v in fmdt.load_draco12() for lo in range(155, 250, 5)]
+>>> df = fmdt.sweep.run("draco12_light", args, max_workers=8, timeout=60)
+
+Public API:
+    run
+    SweepStore
+    default_metrics
+"""
+import os
+import json
+import time
+import sqlite3
+import pandas as pd
+import numpy as np
+import fmdt.api
+import fmdt.args
+import fmdt.res
+
+from fmdt.utils import stderr
+
+DEFAULT_STORE = "sweeps.db"
+
+def default_metrics(res: fmdt.res.DetectionResult) -> dict:
+    """Metrics recorded for every point of a sweep when no `metrics` function is given"""
+
+    return {
+        "nframes": res.nframes,
+        "n_meteors": res.n_meteors_detected(),
+        "n_stars": res.n_stars_detected(),
+        "n_noise": res.n_noise_detected()
+    }
+
+def _json_default(value):
+    """Convert the numpy scalars that sweeps built with np.linspace/np.arange put in DetectArgs"""
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+class SweepStore:
+    """SQLite file holding the completed points of any number of sweeps"""
+
+    def __init__(self, path: str = DEFAULT_STORE):
+        self.path = path
+
+        con = self._connect()
+
+        try:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS points (
+                    sweep TEXT NOT NULL,
+                    video TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    args TEXT NOT NULL,
+                    metrics TEXT NOT NULL,
+                    wall_time REAL,
+                    completed REAL NOT NULL,
+                    PRIMARY KEY (sweep, video, digest)
+                );
+                """)
+        finally:
+            con.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def completed(self, sweep: str) -> set[tuple[str, str]]:
+        """Return the (video, digest) of every point of `sweep` that is already in the store"""
+
+        con = self._connect()
+
+        try:
+            rows = con.execute("SELECT video, digest FROM points WHERE sweep = ?;", (sweep,)).fetchall()
+        finally:
+            con.close()
+
+        return set(rows)
+
+    def record(
+            self,
+            sweep: str,
+            d_args: fmdt.args.DetectArgs,
+            digest: str,
+            status: str,
+            metrics: dict,
+            wall_time: float | None = None
+        ) -> None:
+        """Store a completed point. Each point is committed on its own so that nothing is lost on a crash"""
+
+        con = self._connect()
+
+        try:
+            con.execute("INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, ?, ?);", (
+                sweep,
+                d_args.vid_in_path,
+                digest,
+                status,
+                json.dumps(d_args.to_reduced_dict(), default=_json_default),
+                json.dumps(metrics, default=_json_default),
+                wall_time,
+                time.time()
+            ))
+        finally:
+            con.close()
+
+    def sweeps(self) -> list[str]:
+        """Return the names of the sweeps that have at least one completed point"""
+
+        con = self._connect()
+
+        try:
+            return [r[0] for r in con.execute("SELECT DISTINCT sweep FROM points;").fetchall()]
+        finally:
+            con.close()
+
+    def to_df(self, sweep: str) -> pd.DataFrame:
+        """Return the points of `sweep` with one column per detect argument and per metric"""
+
+        con = self._connect()
+
+        try:
+            rows = con.execute("""
+                SELECT video, digest, status, args, metrics, wall_time FROM points
+                WHERE sweep = ? ORDER BY completed;
+                """, (sweep,)).fetchall()
+        finally:
+            con.close()
+
+        records = []
+
+        for video, digest, status, args, metrics, wall_time in rows:
+            r = {"video": video, "digest": digest, "status": status, "wall_time": wall_time}
+            r.update({k: v for (k, v) in json.loads(args).items() if k != "vid_in_path"})
+            r.update(json.loads(metrics))
+            records.append(r)
+
+        return pd.DataFrame(records)
+
+    def clear(self, sweep: str) -> None:
+        """Forget every point of `sweep`, so that the next run starts from scratch"""
+
+        con = self._connect()
+
+        try:
+            con.execute("DELETE FROM points WHERE sweep = ?;", (sweep,))
+        finally:
+            con.close()
+
+def run(
+        sweep: str,
+        args: list[fmdt.args.DetectArgs],
+        metrics = None,
+        store: str | SweepStore = DEFAULT_STORE,
+        max_workers: int | None = None,
+        timeout: float | None = None,
+        cache: bool = False,
+        save_df: bool = False,
+        verbose: bool = False,
+        scheduler = None
+    ) -> pd.DataFrame:
+    """Detect every point of `sweep` that isn't in `store` yet and record its metrics
+
+    Points whose detection or metrics raised are not recorded, so they are retried when the sweep is run again.
+    Timed out points are recorded with their status, like any other point.
+
+    Parameters
+    ----------
+    sweep (str): Name of the sweep. Running a sweep with the same name resumes it
+    args (list[fmdt.args.DetectArgs]): Points of the sweep
+    metrics (Callable[[DetectionResult], dict]): Values to record for each point. Default default_metrics
+    store (str | SweepStore): SQLite file (or SweepStore) where the points are recorded. Default 'sweeps.db'
+    max_workers, timeout, cache, save_df, verbose, scheduler: Forwarded to fmdt.detect_many
+
+    Return
+    ------
+    The DataFrame of every point of the sweep (SweepStore.to_df), including the ones completed by previous runs
+
+    Examples
+    --------
+    >>> def trk_rate(res):
+    ...     return {"trk_rate": res.check(gt_path="meteors.txt", stdout=None).trk_rate()}
+    >>> df = fmdt.sweep.run("demo", args, metrics=trk_rate)
+    """
+
+    if metrics is None:
+        metrics = default_metrics
+
+    if isinstance(store, str):
+        store = SweepStore(store)
+
+    done = store.completed(sweep)
+    pending = []
+
+    for a in args:
+        key = (a.vid_in_path, a.cache_key())
+
+        if key in done:
+            continue
+
+        done.add(key)
+        pending.append(a)
+
+    if verbose:
+        print(f"Sweep '{sweep}': {len(args) - len(pending)} point(s) already completed, {len(pending)} to run")
+
+    n_done = 0
+
+    for res in fmdt.api.detect_many(pending, max_workers=max_workers, timeout=timeout, cache=cache,
+                                    save_df=save_df, verbose=verbose, scheduler=scheduler):
+
+        d_args = res.args.detect_args
+
+        if res.status == fmdt.res.RunStatus.FAILED and not res.error is None:
+            stderr(f"Sweep '{sweep}': {d_args.vid_in_path} failed ({res.error}), it will be retried on the next run")
+            continue
+
+        digest = d_args.cache_key()
+
+        try:
+            values = metrics(res)
+        except Exception as err:
+            stderr(f"Sweep '{sweep}': metrics failed for {d_args.vid_in_path} ({err}), it will be retried on the next run")
+            continue
+
+        store.record(sweep, d_args, digest, str(res.status), values, res.elapsed())
+        n_done += 1
+
+        if verbose:
+            print(f"Sweep '{sweep}': {n_done}/{len(pending)} {os.path.basename(d_args.vid_in_path)} {digest[0:16]}")
+
+    return store.to_df(sweep)
@@ -139,6 +139,908 @@ class TestArgs(unittest.TestCase):
 
         self.assertRaises(Exception, try_bad_detect)
 
+class TestCacheKey(unittest.TestCase):
+
+    def test_no_video(self):
+
+        d_args = fmdt.DetectArgs(vid_in_path=None)
+
+        self.assertEqual(d_args.cache_key(), fmdt.DetectArgs(vid_in_path=None).cache_key())
+
+    def test_stable_across_output_paths(self):
+
+        import tempfile
+        import fmdt.utils
+
+        with tempfile.TemporaryDirectory() as tmp:
+            vid = os.path.join(tmp, "a.mp4")
+            copy = os.path.join(tmp, "copy_of_a.mp4")
+            other = os.path.join(tmp, "b.mp4")
+
+            for (path, content) in [(vid, b"frames of a" * 1000), (copy, b"frames of a" * 1000), (other, b"frames of b" * 1000)]:
+                with open(path, "wb") as f:
+                    f.write(content)
+
+            a = fmdt.DetectArgs(vid_in_path=vid, trk_path="a_trk.txt", log_path="logs_a")
+            b = fmdt.DetectArgs(vid_in_path=copy, trk_path="elsewhere/trk.txt", log_path=None)
+
+            self.assertEqual(fmdt.utils.video_fingerprint(vid), fmdt.utils.video_fingerprint(copy))
+            self.assertNotEqual(fmdt.utils.video_fingerprint(vid), fmdt.utils.video_fingerprint(other))
+            self.assertEqual(a.cache_key(), b.cache_key())
+            self.assertNotEqual(a.cache_key(), fmdt.DetectArgs(vid_in_path=other, trk_path="a_trk.txt").cache_key())
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+
+        import tempfile
+        import fmdt.config
+        import fmdt.cache
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = fmdt.config.cache_dir
+        self.limits = fmdt.cache.get_limits()
+        fmdt.config.cache_dir = lambda: self.tmp.name
+        fmdt.cache_dir = fmdt.config.cache_dir
+
+    def tearDown(self):
+
+        import fmdt.config
+        import fmdt.cache
+
+        fmdt.config.cache_dir = self.cache_dir
+        fmdt.cache_dir = self.cache_dir
+        fmdt.cache.set_limits(*self.limits)
+        self.tmp.cleanup()
+
+    def write_entry(self, name: str, size: int = 100) -> str:
+
+        import time
+        import fmdt.cache
+
+        # Entries registered at distinct times
+        time.sleep(0.01)
+
+        path = os.path.join(self.tmp.name, name)
+
+        with open(path, "wb") as f:
+            f.write(bytes(size))
+
+        fmdt.cache.register(path)
+
+        return path
+
+    def touch(self, name: str, n: int = 1) -> None:
+
+        import time
+        import fmdt.cache
+
+        for _ in range(n):
+            time.sleep(0.01)
+            fmdt.cache.touch(os.path.join(self.tmp.name, name))
+
+    def entries(self) -> list[str]:
+
+        import fmdt.cache
+
+        return sorted(name for name in os.listdir(self.tmp.name) if not fmdt.cache.is_reserved(name))
+
+    def test_evict_lru(self):
+
+        import fmdt.cache
+
+        fmdt.cache.set_limits(high_bytes=300, low_bytes=200, policy="lru")
+
+        for name in ["a", "b", "c"]:
+            self.write_entry(name)
+
+        self.touch("a")
+
+        # Going over the high watermark evicts the least recently used entries down to the low watermark
+        self.write_entry("d")
+
+        self.assertEqual(self.entries(), ["a", "d"])
+        self.assertEqual(fmdt.cache.total_size(), 200)
+        self.assertEqual(fmdt.cache.n_entries(), 2)
+
+    def test_evict_lfu(self):
+
+        import fmdt.cache
+
+        fmdt.cache.set_limits(high_bytes=300, low_bytes=200, policy="lfu")
+
+        for name in ["a", "b", "c"]:
+            self.write_entry(name)
+
+        self.touch("a", 2)
+        self.touch("b")
+
+        # c and d were never hit, d being the most recent entry doesn't save it
+        self.write_entry("d")
+
+        self.assertEqual(self.entries(), ["a", "b"])
+        self.assertEqual(fmdt.cache.total_size(), 200)
+
+    def test_rebuild_missing_index(self):
+
+        import fmdt.cache
+
+        for name, size in [("a", 100), ("b", 250)]:
+            self.write_entry(name, size)
+
+        os.makedirs(os.path.join(self.tmp.name, "c"))
+
+        with open(os.path.join(self.tmp.name, "c", "trk.txt"), "wb") as f:
+            f.write(bytes(50))
+
+        os.remove(fmdt.cache.index_path())
+
+        fmdt.cache.init()
+
+        self.assertEqual(fmdt.cache.total_size(), 400)
+        self.assertEqual(fmdt.cache.n_entries(), 3)
+
+    def test_read_through(self):
+
+        import tempfile
+
+        trk_list = [fmdt.core.TrackedObject(1, 10, 1.0, 2.0, 20, 3.0, 4.0, fmdt.core.ObjectType.METEOR)]
+        runs = []
+
+        def stream_process(argv, *args, **kwargs):
+            runs.append(argv)
+            raise RuntimeError("fmdt-detect executed")
+
+        stream = fmdt.api._stream_process
+        fmdt.api._stream_process = stream_process
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                vid_in_path = os.path.join(tmp, "demo.mp4")
+
+                with open(vid_in_path, "wb") as f:
+                    f.write(b"demo video")
+
+                fmdt.core.write_tracks_file(fmdt.DetectArgs(vid_in_path=vid_in_path).cache_trk(), trk_list)
+
+                res = fmdt.detect(vid_in_path=vid_in_path, trk_path=os.path.join(tmp, "trk.txt"), cache=True)
+
+                self.assertEqual(runs, [])
+                self.assertEqual([_track_fields(t) for t in res.trk_list], [_track_fields(t) for t in trk_list])
+                self.assertEqual([_track_fields(t) for t in res.get_trk_list()], [_track_fields(t) for t in trk_list])
+        finally:
+            fmdt.api._stream_process = stream
+
+    def test_clear_removes_locks(self):
+
+        import fmdt.cache
+
+        lock_dir = os.path.join(self.tmp.name, "locks")
+
+        with fmdt.cache.lock("a"):
+            with fmdt.cache.lock("b"):
+                pass
+
+            fmdt.cache.clear()
+
+            # "a" is held, so its file stays
+            self.assertEqual(os.listdir(lock_dir), ["a.lock"])
+
+        fmdt.cache.clear()
+
+        self.assertEqual(os.listdir(lock_dir), [])
+
+        with fmdt.cache.lock("a"):
+            self.assertEqual(os.listdir(lock_dir), ["a.lock"])
+
+    def test_track_table(self):
+
+        import tempfile
+        import numpy as np
+        import fmdt.cache
+
+        trk_list = [fmdt.core.TrackedObject(1, 10, 1.0, 2.0, 20, 3.0, 4.0, fmdt.core.ObjectType.METEOR)]
+
+        trk_path = os.path.join(self.tmp.name, "abc_trk.txt")
+        fmdt.core.write_tracks_file(trk_path, trk_list)
+        sidecar = fmdt.cache.tracks_sidecar(trk_path)
+
+        parsed = fmdt.cache.track_table(trk_path)
+        mapped = fmdt.cache.track_table(trk_path)
+
+        self.assertTrue(os.path.exists(sidecar))
+        self.assertIsInstance(mapped.data, np.memmap)
+        self.assertEqual([_track_fields(t) for t in mapped], [_track_fields(t) for t in parsed])
+
+        # Tracks files written elsewhere are parsed, but not stored in the cache
+        with tempfile.TemporaryDirectory() as tmp:
+            trk_path = os.path.join(tmp, "trk.txt")
+            fmdt.core.write_tracks_file(trk_path, trk_list)
+
+            self.assertEqual([_track_fields(t) for t in fmdt.cache.track_table(trk_path)], [_track_fields(t) for t in parsed])
+            self.assertFalse(os.path.exists(fmdt.cache.tracks_sidecar(trk_path)))
+
+class TestDetectMany(unittest.TestCase):
+
+    VID = "demo.mp4"
+
+    def test_independent_trk_paths(self):
+
+        args = [fmdt.DetectArgs(vid_in_path=self.VID, ccl_hyst_lo=lo) for lo in [200, 220, 240]]
+        jobs = fmdt.api._independent_detect_args(args)
+
+        trk_paths = [j.trk_path for j in jobs]
+
+        self.assertEqual(len(set(trk_paths)), len(args))
+
+        # The caller's args are left untouched
+        for a in args:
+            self.assertIsNone(a.trk_path)
+
+    def test_shared_trk_path(self):
+
+        args = [fmdt.DetectArgs(vid_in_path=self.VID, ccl_hyst_lo=lo, trk_path="trk.txt") for lo in [200, 220]]
+
+        self.assertRaises(ValueError, lambda: fmdt.api._independent_detect_args(args))
+
+    def test_identical_args(self):
+
+        args = [fmdt.DetectArgs(vid_in_path=self.VID, ccl_hyst_lo=200, trk_path="trk.txt") for _ in range(3)]
+        jobs = fmdt.api._independent_detect_args(args)
+
+        self.assertEqual(len(set([j.digest() for j in jobs])), 1)
+
+    def test_directory_jobs(self):
+
+        template = fmdt.DetectArgs(vid_in_path=self.VID, trk_path="trk.txt", log_path="logs")
+        jobs = [fmdt.api._directory_job(template, v) for v in ["night/a.mp4", "night/b.avi"]]
+
+        self.assertEqual([j.vid_in_path for j in jobs], ["night/a.mp4", "night/b.avi"])
+        self.assertEqual([j.log_path for j in jobs], [os.path.join("logs", "a"), os.path.join("logs", "b")])
+        self.assertTrue(all([j.trk_path is None for j in jobs]))
+        self.assertEqual(template.trk_path, "trk.txt")
+
+    def test_try_command_jobs(self):
+
+        import copy
+        import stat
+        import tempfile
+        import fmdt.truth
+
+        meteors = [("a.mp4", 10, 20), ("a.mp4", 40, 50), ("a.mp4", 70, 80), ("b.mp4", 10, 20), ("b.mp4", 30, 40)]
+        jobs = []
+
+        def detect_many(args, max_workers=None, timeout=None, verbose=False):
+            jobs.extend(args)
+
+            for d_args in args:
+                # Only the first two meteors of a.mp4 are found
+                found = [m for m in meteors[0:2] if d_args.vid_in_path.endswith(m[0])]
+                trk_list = [fmdt.core.TrackedObject(i + 1, f0, 1.0, 2.0, f1, 30.0, 40.0, fmdt.core.ObjectType.METEOR) for (i, (_, f0, f1)) in enumerate(found)]
+
+                yield fmdt.res.DetectionResult(100, None, fmdt.Args(d_args), trk_list)
+
+        exec_path = fmdt.args.get_exec_path()
+        run = fmdt.api.detect_many
+        fmdt.api.detect_many = detect_many
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                csv = os.path.join(tmp, "human_detections.csv")
+
+                with open(csv, "w") as f:
+                    f.write("video_name,start_frame,end_frame,start_x,start_y,end_x,end_y\n")
+
+                    for (video, f0, f1) in meteors:
+                        f.write(f"{video},{f0},{f1},1.0,2.0,30.0,40.0\n")
+
+                # The commands printed by try_command only need an fmdt-detect to be found
+                exe = os.path.join(tmp, "fmdt-detect")
+
+                with open(exe, "w") as f:
+                    f.write("#!/bin/sh\n")
+
+                os.chmod(exe, stat.S_IRWXU)
+                fmdt.args.set_exec_path(tmp)
+
+                gt = fmdt.truth.GroundTruth(csv, tmp)
+
+                # No detect_args: the template is an empty DetectArgs
+                detected = gt.try_command(fmdt.Args())
+
+                self.assertEqual(detected, [True, True, False, False, False])
+                self.assertEqual(sorted(os.path.basename(j.vid_in_path) for j in jobs), ["a.mp4", "b.mp4"])
+
+                # Identical configurations of the same videos are detected once
+                jobs.clear()
+                same = fmdt.Args(fmdt.DetectArgs(vid_in_path=None, ccl_hyst_lo=200))
+                results = gt._detect_all([same, copy.deepcopy(same), fmdt.Args(fmdt.DetectArgs(vid_in_path=None, ccl_hyst_lo=220))], log=False)
+
+                self.assertEqual(len(jobs), 4)
+                self.assertEqual([sorted(os.path.basename(v) for v in r) for r in results], [["a.mp4", "b.mp4"]] * 3)
+        finally:
+            fmdt.api.detect_many = run
+            fmdt.args.set_exec_path(exec_path)
+
+class TestResourceUsage(unittest.TestCase):
+
+    def test_derived_values(self):
+
+        usage = fmdt.res.ResourceUsage(2.0, user=1.5, sys=0.25, max_rss=1024, nframes=100)
+
+        self.assertEqual(usage.cpu(), 1.75)
+        self.assertEqual(usage.fps(), 50.0)
+        self.assertIsNone(fmdt.res.ResourceUsage(2.0).cpu())
+        self.assertIsNone(fmdt.res.ResourceUsage(0.0, nframes=10).fps())
+
+class TestScheduler(unittest.TestCase):
+
+    def test_cores_for(self):
+
+        sched = fmdt.Scheduler(cores=4)
+
+        self.assertEqual(sched.cores_for(fmdt.DetectArgs(vid_in_path="demo.mp4")), 1)
+        self.assertEqual(sched.cores_for(fmdt.DetectArgs(vid_in_path="demo.mp4", vid_in_threads=3)), 3)
+        self.assertEqual(sched.cores_for(fmdt.DetectArgs(vid_in_path="demo.mp4", vid_in_threads=16)), 4)
+
+    def test_budget(self):
+
+        sched = fmdt.Scheduler(cores=4)
+
+        with sched.slot(fmdt.DetectArgs(vid_in_path="demo.mp4", vid_in_threads=3)):
+            self.assertEqual(sched.in_use(), 3)
+
+        self.assertEqual(sched.in_use(), 0)
+
+    def test_memory_budget(self):
+
+        self.assertEqual(fmdt.Scheduler(cores=4).memory_for(fmdt.DetectArgs(vid_in_path="demo.mp4")), 0)
+
+        import threading
+        import time
+
+        sched = fmdt.Scheduler(cores=4, memory=100)
+        sched.acquire(1, 60)
+
+        admitted = threading.Event()
+
+        def second_job():
+            sched.acquire(1, 60)
+            admitted.set()
+
+        waiter = threading.Thread(target=second_job)
+        waiter.start()
+
+        # Cores are free, but a second 60 byte job has to wait for the memory of the first one
+        self.assertFalse(admitted.wait(0.2))
+
+        sched.release(1, [], time.monotonic(), 60)
+
+        self.assertTrue(admitted.wait(5))
+        waiter.join()
+        self.assertEqual(sched.in_use(), 1)
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_run(self):
+
+        import threading
+        import time
+
+        calls = []
+        results = []
+
+        def run():
+            calls.append(1)
+            time.sleep(0.2)
+            return "result"
+
+        threads = [threading.Thread(target=lambda: results.append(fmdt.api._single_flight("key", run))) for _ in range(4)]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted([shared for _, shared in results]), [False, True, True, True])
+        self.assertEqual(fmdt.api._INFLIGHT, {})
+
+    def test_follower_gets_its_tracks_file(self):
+
+        import tempfile
+
+        trk_list = [fmdt.core.TrackedObject(1, 10, 1.0, 2.0, 20, 3.0, 4.0, fmdt.core.ObjectType.METEOR)]
+        leader = fmdt.res.DetectionResult(30, None, fmdt.Args(fmdt.DetectArgs(vid_in_path=None)), trk_list)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            follower = fmdt.Args(fmdt.DetectArgs(vid_in_path=None, trk_path=os.path.join(tmp, "trk.txt")))
+            shared = fmdt.api._shared_result(leader, follower)
+
+            self.assertEqual([t.lifetime() for t in fmdt.core.read_tracks_file(shared.args.trk_path())], [(10, 20)])
+
+    def test_followers_get_their_own_tracks(self):
+
+        import pandas as pd
+
+        trk_list = [fmdt.core.TrackedObject(1, 10, 1.0, 2.0, 20, 3.0, 4.0, fmdt.core.ObjectType.METEOR)]
+        args = fmdt.Args(fmdt.DetectArgs(vid_in_path=None))
+        leader = fmdt.res.DetectionResult(30, pd.DataFrame({"x": [1.0]}), args, trk_list)
+
+        shared = fmdt.api._shared_result(leader, args)
+        shared.trk_list[0].start_frame = 15
+        shared.trk_list.append(shared.trk_list[0])
+        shared.df.loc[0, "x"] = 2.0
+
+        self.assertEqual(len(leader.trk_list), 1)
+        self.assertEqual(leader.trk_list[0].start_frame, 10)
+        self.assertEqual(leader.df.loc[0, "x"], 1.0)
+
+class TestAsync(unittest.TestCase):
+
+    def test_timeout(self):
+
+        import asyncio
+        import tempfile
+        import fmdt.aio
+
+        with tempfile.TemporaryFile('w+') as outfile:
+            returncode, timed_out, _ = asyncio.run(fmdt.aio._stream_process(["sleep", "5"], outfile, 0.2, False))
+
+        self.assertTrue(timed_out)
+        self.assertNotEqual(returncode, 0)
+        self.assertEqual(fmdt.api._run_status(returncode, timed_out), fmdt.res.RunStatus.TIMEOUT)
+
+    def test_max_concurrency(self):
+
+        import asyncio
+        import tempfile
+        import time
+        import fmdt.aio
+
+        async def two_sleeps(outfile):
+            return await asyncio.gather(*[fmdt.aio._stream_process(["sleep", "0.3"], outfile, None, False) for _ in range(2)])
+
+        n = fmdt.aio.get_max_concurrency()
+        fmdt.aio.set_max_concurrency(1)
+
+        try:
+            with tempfile.TemporaryFile('w+') as outfile:
+                start = time.monotonic()
+                runs = asyncio.run(two_sleeps(outfile))
+                elapsed = time.monotonic() - start
+        finally:
+            fmdt.aio.set_max_concurrency(n)
+
+        # One process at a time: the second sleep only starts once the first one is over
+        self.assertEqual([(returncode, timed_out) for returncode, timed_out, _ in runs], [(0, False), (0, False)])
+        self.assertGreaterEqual(elapsed, 0.6)
+
+    def test_single_flight(self):
+
+        import asyncio
+        import fmdt.aio
+
+        calls = []
+
+        async def run():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return "result"
+
+        async def callers():
+            return await asyncio.gather(*[fmdt.aio._single_flight("key", run) for _ in range(4)])
+
+        results = asyncio.run(callers())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted([shared for _, shared in results]), [False, True, True, True])
+        self.assertEqual(fmdt.api._INFLIGHT, {})
+
+class TestSweepStore(unittest.TestCase):
+
+    def test_record_and_resume(self):
+
+        import tempfile
+        import fmdt.sweep
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = fmdt.sweep.SweepStore(os.path.join(tmp, "sweeps.db"))
+            d_args = fmdt.args.DetectArgs(vid_in_path="demo.mp4", ccl_hyst_lo=200)
+
+            store.record("demo", d_args, "abc", "ok", {"n_meteors": 3}, 1.5)
+
+            self.assertEqual(store.completed("demo"), {("demo.mp4", "abc")})
+            self.assertEqual(store.completed("other"), set())
+
+            df = store.to_df("demo")
+            self.assertEqual(df["n_meteors"][0], 3)
+            self.assertEqual(df["ccl_hyst_lo"][0], 200)
+
+    def test_metrics_error(self):
+
+        import tempfile
+        import fmdt.sweep
+
+        args = [fmdt.args.DetectArgs(vid_in_path="demo.mp4", ccl_hyst_lo=lo) for lo in [200, 220, 240]]
+
+        def detect_many(jobs, **kwargs):
+            for d_args in jobs:
+                yield fmdt.res.DetectionResult(100, None, fmdt.Args(d_args), [])
+
+        def metrics(res):
+            if res.args.detect_args.ccl_hyst_lo == 220:
+                raise ValueError("no ground truth")
+
+            return {"n_meteors": 0}
+
+        run = fmdt.api.detect_many
+        fmdt.api.detect_many = detect_many
+
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = fmdt.sweep.SweepStore(os.path.join(tmp, "sweeps.db"))
+
+                # The point whose metrics raised is skipped, the sweep goes on
+                df = fmdt.sweep.run("demo", args, metrics=metrics, store=store)
+
+                self.assertEqual(sorted(df["ccl_hyst_lo"]), [200, 240])
+                self.assertEqual(len(store.completed("demo")), 2)
+        finally:
+            fmdt.api.detect_many = run
+
+class TestTPE(unittest.TestCase):
+
+    def test_ask_within_space(self):
+
+        import fmdt.search
+
+        space = [fmdt.search.Param("ccl_hyst_lo", 150, 255), fmdt.search.Param("trk_angle", 10.0, 40.0)]
+        tpe = fmdt.search.TPE(space, n_startup=4, seed=0)
+
+        for _ in range(5):
+            for params in tpe.ask(4):
+                self.assertTrue(150 <= params["ccl_hyst_lo"] <= 255)
+                self.assertIsInstance(params["ccl_hyst_lo"], int)
+                self.assertTrue(10.0 <= params["trk_angle"] <= 40.0)
+                tpe.tell(params, -abs(params["ccl_hyst_lo"] - 200))
+
+        keys = [tpe._key(p) for p, _ in tpe.trials]
+        self.assertEqual(len(keys), len(set(keys)))
+
+    def test_exhausted_space(self):
+
+        import fmdt.search
+
+        tpe = fmdt.search.TPE([fmdt.search.Param("knn_k", 1, 4)], seed=0)
+
+        for params in tpe.ask(10):
+            tpe.tell(params, params["knn_k"])
+
+        self.assertEqual(len(tpe.trials), 4)
+        self.assertEqual(tpe.ask(2), [])
+        self.assertEqual(tpe.best(), ({"knn_k": 4}, 4))
+
+    def test_normalized_proposals(self):
+
+        import fmdt.search
+
+        space = [fmdt.search.Param("ccl_hyst_lo", 0, 2), fmdt.search.Param("ccl_hyst_hi", 0, 2)]
+        tpe = fmdt.search.TPE(space, n_startup=2, seed=0, normalize=fmdt.search._ordered)
+
+        for _ in range(10):
+            for params in tpe.ask(2):
+                tpe.tell(params, params["ccl_hyst_hi"] - params["ccl_hyst_lo"])
+
+        # Every ordered pair of {0, 1, 2} is tried once, a swapped proposal never repeats a trial
+        keys = sorted(tpe._key(p) for p, _ in tpe.trials)
+        self.assertEqual(keys, [(0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2)])
+        self.assertEqual(tpe.ask(1), [])
+
+class TestSuccessiveHalving(unittest.TestCase):
+
+    class Video:
+
+        def __init__(self, name: str):
+            self.name = name
+
+        def meteors(self) -> list:
+            return []
+
+        def full_path(self) -> str:
+            return self.name + ".mp4"
+
+        def prefix(self) -> str:
+            return self.name
+
+    def test_rungs(self):
+
+        import fmdt.search
+
+        candidates = [fmdt.DetectArgs(vid_in_path=None, ccl_hyst_lo=200 + i) for i in range(9)]
+        videos = [self.Video(f"v{j}") for j in range(9)]
+        rungs = []
+        evaluated = []
+
+        def detect_many(jobs, max_workers=None, timeout=None):
+            rungs.append(len(jobs))
+
+            for d_args in jobs:
+                yield fmdt.res.DetectionResult(100, None, fmdt.Args(d_args), [])
+
+        def evaluate(res, video, meteors):
+            # Higher thresholds score better, whatever the video
+            lo = res.args.detect_args.ccl_hyst_lo
+            evaluated.append((lo, video.name))
+
+            return (lo - 200) / 10, 1
+
+        run, score = fmdt.api.detect_many, fmdt.search._evaluate
+        fmdt.api.detect_many, fmdt.search._evaluate = detect_many, evaluate
+
+        try:
+            ranking = fmdt.search.successive_halving(candidates, videos, eta=3)
+        finally:
+            fmdt.api.detect_many, fmdt.search._evaluate = run, score
+
+        # 9 candidates on 1 video, the best 3 on 3 videos, then the last survivor on all 9:
+        # each rung only detects the videos a survivor hasn't been evaluated on yet
+        self.assertEqual(rungs, [9, 3 * 2, 1 * 6])
+        self.assertEqual(len(evaluated), len(set(evaluated)))
+
+        self.assertEqual(list(ranking["candidate"][0:3]), [8, 7, 6])
+        self.assertEqual(list(ranking["n_videos"]), [9, 3, 3] + [1] * 6)
+        self.assertEqual(list(ranking["survivor"]), [True] + [False] * 8)
+        self.assertEqual(ranking["n_Tpos"][0], 9)
+
+class TestWindowedEvaluation(unittest.TestCase):
+
+    def test_meteor_windows(self):
+
+        import fmdt.truth
+
+        meteors = [fmdt.truth.HumanDetection("v.avi", f0, fT, 0, 0, 10, 10) for (f0, fT) in [(1000, 1020), (1030, 1040), (5000, 5010), (40, 50)]]
+        windows = fmdt.truth.meteor_windows(meteors, margin=20)
+
+        self.assertEqual(windows, [(20, 70), (980, 1060), (4980, 5030)])
+
+    def test_shift_tracks(self):
+
+        import fmdt.truth
+
+        relative = [fmdt.core.TrackedObject(1, 20, 0, 0, 40, 10, 10, fmdt.core.ObjectType.METEOR)]
+        absolute = [fmdt.core.TrackedObject(1, 1000, 0, 0, 1020, 10, 10, fmdt.core.ObjectType.METEOR)]
+
+        window = fmdt.truth.FrameNumbering.WINDOW
+        video = fmdt.truth.FrameNumbering.VIDEO
+
+        self.assertEqual(fmdt.truth.shift_tracks(relative, 980, window)[0].lifetime(), (1000, 1020))
+        self.assertEqual(fmdt.truth.shift_tracks(absolute, 980, video)[0].lifetime(), (1000, 1020))
+        self.assertEqual(relative[0].lifetime(), (20, 40))
+
+        # A window that starts close to the beginning of the video: the tracks may end before
+        # stop - start + 1 and must still not be shifted when they are numbered like the video
+        small_start = [fmdt.core.TrackedObject(1, 20, 0, 0, 30, 10, 10, fmdt.core.ObjectType.METEOR)]
+
+        self.assertEqual(fmdt.truth.shift_tracks(small_start, 10, video)[0].lifetime(), (20, 30))
+        self.assertEqual(fmdt.truth.shift_tracks(small_start, 10)[0].lifetime(), (20, 30))
+        self.assertEqual(fmdt.truth.shift_tracks(small_start, 10, window)[0].lifetime(), (30, 40))
+
+    def test_write_tracks_file(self):
+
+        import tempfile
+
+        trk_list = [fmdt.core.TrackedObject(1, 1000, 12.5, 40.0, 1020, 80.0, 90.25, fmdt.core.ObjectType.METEOR),
+                    fmdt.core.TrackedObject(2, 3, 1.0, 2.0, 300, 1.0, 2.0, fmdt.core.ObjectType.STAR)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            trk_path = os.path.join(tmp, "trk.txt")
+            fmdt.core.write_tracks_file(trk_path, trk_list)
+            read = fmdt.core.read_tracks_file(trk_path)
+
+        self.assertEqual([(t.id, t.lifetime(), t.type) for t in read], [(t.id, t.lifetime(), t.type) for t in trk_list])
+        self.assertEqual(read[0].end_y, 90.2)
+
+class TestHysteresisBand(unittest.TestCase):
+
+    def test_probe_order(self):
+
+        import fmdt.truth
+
+        probes = fmdt.truth._probe_order(0, 240, 30)
+
+        self.assertEqual(probes, [120, 60, 180, 30, 90, 150, 210])
+
+class TestScreeningReport(unittest.TestCase):
+
+    def test_correlations(self):
+
+        import fmdt.truth
+
+        candidates = [fmdt.Args.new() for _ in range(4)]
+        stages = [{"vid_in_skip": 3}, {}]
+        scores = [{0: 1, 1: 4, 2: 3, 3: 0}, {1: 5, 2: 2}]
+
+        report = fmdt.truth.ScreeningReport(candidates, stages, scores, n_videos=2)
+
+        self.assertEqual(report.stage_names(), ["vid_in_skip=3", "full"])
+        self.assertAlmostEqual(report.correlations()["vid_in_skip=3"], 1.0)
+        self.assertIs(report.best(), candidates[1])
+        self.assertEqual(report.n_runs(), 12)
+
+class TestHeatmap(unittest.TestCase):
+
+    def test_matrix_round_trip(self):
+
+        import tempfile
+        import fmdt.truth
+
+        minmax = [(240, 245), (245, 250), (250, 255)]
+        successes = [[True, False], [True, True], [False, False]]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "heatmap.npy")
+            fmdt.truth.save_heatmap_matrix(path, minmax, successes)
+            loaded_minmax, loaded_successes = fmdt.truth.load_heatmap_matrix(path)
+
+            fmdt.truth.plot_gt(loaded_minmax, loaded_successes, save_path=os.path.join(tmp, "heatmap.png"))
+            self.assertTrue(os.path.exists(os.path.join(tmp, "heatmap.png")))
+
+        self.assertEqual(loaded_minmax, minmax)
+        self.assertEqual(loaded_successes.tolist(), successes)
+
+def _track_fields(t: fmdt.core.TrackedObject) -> tuple:
+    return (t.id, t.start_frame, t.start_x, t.start_y, t.end_frame, t.end_x, t.end_y, t.type)
+
+class TestTrackTable(unittest.TestCase):
+
+    def test_parse_track_table(self):
+
+        import tempfile
+
+        trk_list = [fmdt.core.TrackedObject(i + 1, i, 1.5 * i, 2.0, i + 10, 3.0, 4.0, fmdt.core.ObjectType(i % 3)) for i in range(7)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            trk_path = os.path.join(tmp, "trk.txt")
+            fmdt.core.write_tracks_file(trk_path, trk_list)
+            table = fmdt.core.read_track_table(trk_path)
+
+        self.assertEqual(len(table), 7)
+        self.assertEqual(table["start_x"].tolist(), [1.5 * i for i in range(7)])
+        self.assertEqual(len(table.meteors()), 3)
+        self.assertEqual(table.in_frames(0, 2)["id"].tolist(), [1, 2, 3])
+        self.assertEqual([_track_fields(t) for t in table], [_track_fields(t) for t in trk_list])
+        self.assertEqual(len(fmdt.core.read_track_table(os.path.join(tmp, "missing.txt"))), 0)
+
+    def test_read_detect_output(self):
+
+        output = fmdt.core.read_detect_output(os.path.join(os.path.dirname(__file__), "..", "examples", "ex1_detect_tracks.txt"))
+
+        self.assertEqual(output.nframes, 256)
+        self.assertEqual(len(output.tracks), 38)
+        self.assertEqual(output.stats["detected_tracks"], {"meteor": 38, "star": 0, "noise": 0, "total": 38})
+        self.assertEqual(fmdt.core.read_detect_output("missing.txt").nframes, 0)
+
+    def test_track_parser(self):
+
+        import asyncio
+        import sys
+        import tempfile
+        import fmdt.aio
+
+        captured = os.path.join(os.path.dirname(__file__), "..", "examples", "ex1_detect_tracks.txt")
+        batch = fmdt.core.read_detect_output(captured)
+
+        # Replays the captured stdout of fmdt-detect in small chunks, most of them ending mid-line
+        replay = "\n".join([
+            "import sys, time",
+            "data = open(sys.argv[1], 'rb').read()",
+            "for i in range(0, len(data), 37):",
+            "    sys.stdout.buffer.write(data[i:i + 37])",
+            "    sys.stdout.buffer.flush()",
+            "    time.sleep(0.001)",
+        ])
+        argv = [sys.executable, "-c", replay, captured]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            streamed = []
+            trk_path = os.path.join(tmp, "trk.txt")
+            trk_list, nframes, status, _, _ = fmdt.api._run_detect(trk_path, argv, None, False, False, None, on_track=streamed.append)
+
+            self.assertEqual(status, fmdt.res.RunStatus.OK)
+            self.assertEqual(nframes, batch.nframes)
+            self.assertEqual([_track_fields(t) for t in trk_list], [_track_fields(t) for t in batch.trk_list()])
+            self.assertEqual([_track_fields(t) for t in streamed], [_track_fields(t) for t in batch.trk_list()])
+
+            # The tracks file is the captured stdout
+            with open(trk_path) as f, open(captured) as g:
+                self.assertEqual(f.read(), g.read())
+
+            trk_path = os.path.join(tmp, "async_trk.txt")
+            trk_list, nframes, status, _, _ = asyncio.run(fmdt.aio._run_detect(trk_path, argv, None, False, False, None))
+
+            self.assertEqual(status, fmdt.res.RunStatus.OK)
+            self.assertEqual(nframes, batch.nframes)
+            self.assertEqual([_track_fields(t) for t in trk_list], [_track_fields(t) for t in batch.trk_list()])
+            self.assertEqual(fmdt.core.read_detect_output(trk_path).nframes, batch.nframes)
+
+    def test_iter_tracks(self):
+
+        import tempfile
+
+        trk_list = [fmdt.core.TrackedObject(i + 1, 10 * i, 1.0, 2.0, 10 * i + 5, 3.0, 4.0, fmdt.core.ObjectType(i % 3)) for i in range(9)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            trk_path = os.path.join(tmp, "trk.txt")
+            fmdt.core.write_tracks_file(trk_path, trk_list)
+
+            meteors = fmdt.core.iter_tracks(trk_path, types=fmdt.core.ObjectType.METEOR)
+            in_window = fmdt.core.iter_tracks(trk_path, types=["star", "noise"], frame_range=(25, 50))
+
+            self.assertEqual([t.id for t in meteors], [1, 4, 7])
+            self.assertEqual([t.id for t in in_window], [3, 5, 6])
+
+            for types in ["meteors", ["Meteor ", "stars"]]:
+                with self.assertRaises(ValueError):
+                    fmdt.core.iter_tracks(trk_path, types=types)
+
+    def test_malformed_row(self):
+
+        text = "   1 || 10 | 1.0 | 2.0 || 20 | 3.0 | 4.0 || meteor\n   2 || 11 | 1.0 || 21 | 3.0 | 4.0 || star\n"
+
+        # Same error as the line by line parser, instead of shifting the columns of the following rows
+        with self.assertRaises(ValueError):
+            fmdt.core.parse_track_table(text)
+
+class TestTrajectory(unittest.TestCase):
+
+    def test_derived_quantities_follow_mutation(self):
+
+        import copy
+        import math
+        import pickle
+        import fmdt.truth
+
+        m = fmdt.truth.HumanDetection("v.avi", 10, 20, 0.0, 0.0, 10.0, 10.0)
+
+        self.assertAlmostEqual(m.direction(), math.pi / 4)
+        self.assertEqual(m.velocity(), (1.0, 1.0))
+
+        c = copy.deepcopy(m)
+        c.start_frame = 15
+        c.end_x = 0.0
+
+        self.assertEqual(c.lifetime(), (15, 20))
+        self.assertEqual(c.velocity(), (0.0, 2.0))
+        self.assertEqual(c.slope(), float("inf"))
+        self.assertEqual(m.lifetime(), (10, 20))
+        self.assertEqual(pickle.loads(pickle.dumps(c)).direction(), c.direction())
+
+        with self.assertRaises(AttributeError):
+            m.detected = True
+
+        with self.assertRaises(ZeroDivisionError):
+            fmdt.core.TrackedObject(1, 5, 0, 0, 5, 1, 1, fmdt.core.ObjectType.NOISE).dx()
+
+class TestRunStatus(unittest.TestCase):
+
+    def test_run_status(self):
+
+        self.assertEqual(fmdt.api._run_status(0, False), fmdt.res.RunStatus.OK)
+        self.assertEqual(fmdt.api._run_status(-15, True), fmdt.res.RunStatus.TIMEOUT)
+        self.assertEqual(fmdt.api._run_status(1, False), fmdt.res.RunStatus.FAILED)
+        # Completed right as the timer expired
+        self.assertEqual(fmdt.api._run_status(0, True), fmdt.res.RunStatus.OK)
+
+    def test_error_marks_failed(self):
+
+        args = fmdt.Args.new()
+        res = fmdt.res.DetectionResult(0, None, args, [], error=RuntimeError("fmdt-detect not found"))
+
+        self.assertTrue(res.failed())
+        self.assertFalse(res.ok())
+
 
 
 
@@ -10,16 +10,42 @@ import math
 import fmdt.core
 import fmdt.utils
 import fmdt.args
+import fmdt.api
 from fmdt.core import TrackedObject
 import numpy as np
 import os
+import copy
+import tempfile
 from termcolor import colored
 from deprecated import deprecated
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
 
 WATEC6_DIR:  str = "./"
 WATEC12_DIR: str = "./"
 
-class HumanDetection:
+# Frames detected before and after each meteor in windowed evaluations, so that the tracker
+# has time to confirm an object before the meteor appears and to close its track after
+WINDOW_MARGIN: int = 25
+
+class FrameNumbering(Enum):
+    """How the frames of the tracks of a run with `vid_in_start` are numbered"""
+    VIDEO  = 0 # from the first frame of the video
+    WINDOW = 1 # from `vid_in_start`
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+# fmdt-detect skips to --vid-in-start but keeps counting frames from the beginning of the video,
+# so the tracks of a window are already numbered like the whole video
+DETECT_FRAME_NUMBERING: FrameNumbering = FrameNumbering.VIDEO
+
+# Screening stages of GroundTruth.screen: detect one frame in four, then one in two
+DEFAULT_FIDELITIES: list[dict] = [{"vid_in_skip": 3}, {"vid_in_skip": 1}]
+
+class HumanDetection(fmdt.core.Trajectory):
+
+    __slots__ = ("video_name",)
 
     GROUND_TRUTH = None
 
@@ -35,12 +61,13 @@ class HumanDetection:
         ):
 
         self.video_name = video_name
-        self.start_frame = start_frame
-        self.end_frame = end_frame
-        self.start_x = start_x
-        self.start_y = start_y
-        self.end_x = end_x
-        self.end_y = end_y
+        self._start_frame = start_frame
+        self._end_frame = end_frame
+        self._start_x = start_x
+        self._start_y = start_y
+        self._end_x = end_x
+        self._end_y = end_y
+        self._forget()
 
     def __str__(self) -> str:
         return (
@@ -62,41 +89,6 @@ class HumanDetection:
         v, _ = fmdt.utils.decompose_video_filename(self.video_name)
         return "Draconids-12mm" in v 
     
-    def delta_x(self) -> float:
-        """Displacement in the x_axis direction"""
-        return self.end_x - self.start_x
-    
-    def delta_y(self) -> float:
-        """Displacement in the y direction"""
-        return self.end_y - self.start_y
-    
-    def displacement(self) -> tuple[float, float]:
-        return (self.delta_x(), self.delta_y())
-    
-    def lifetime(self) -> tuple[int, int]:
-        return (self.start_frame, self.end_frame)
-    
-    def nframes_alive(self) -> int:
-        return self.end_frame - self.start_frame
-
-    def slope(self) -> float:
-        if self.delta_x() == 0:
-            return float("inf")
-        return self.delta_y() / self.delta_x()
-    
-    def direction(self) -> float:
-        """Return the angle of the displacement vector of this meteor. Units are radians"""
-        return math.atan2(self.delta_y(), self.delta_x())
-    
-    def dx(self) -> float:
-        return self.delta_x() / self.nframes_alive()
-    
-    def interpolate_pos(self, frame_n: int) -> tuple[float, float]:
-        f_prime = frame_n - self.start_frame
-        xi = self.start_x + (self.dx() * f_prime)
-        yi = self.start_y + (self.dx() * self.slope()) * f_prime
-        return (xi, yi)
-
     def is_detected_in_list(self, tracking_list: list[TrackedObject]) -> bool:
 
         # keep only meteors
@@ -222,20 +214,80 @@ class GroundTruth:
     def n_unique_videos(self) -> int:
         return len(self.vids())
 
-    def try_command(self, args: fmdt.args.Args) -> list[bool]:
+    def _detect_all(self, args_list: list[fmdt.args.Args], max_workers: int | None = None, log: bool = True) -> list[dict]:
+        """Detect every video of this database with every Args of `args_list`, as a single batch of fmdt.detect_many
+
+        Return
+        ------
+        One {video name -> DetectionResult} dict per Args of `args_list`
+        """
+
+        templates = []
+
+        for args in args_list:
+            template = fmdt.args.DetectArgs(vid_in_path=None) if args.detect_args is None else args.detect_args
+
+            if not template.log_path is None:
+                fmdt.utils.mkdir_p(template.log_path)
+
+            templates.append(template)
+
+        # (video, cache key) -> indices of the Args it belongs to, identical configurations are detected once
+        owners = {}
+        jobs = []
+
+        for (i, template) in enumerate(templates):
+            for v in self.vids():
+                job = fmdt.api._directory_job(template, v)
+
+                if len(templates) > 1:
+                    # Distinct configurations of the same video can't share a log directory
+                    job.log_path = None
+
+                key = (v, job.cache_key())
+
+                if not key in owners:
+                    owners[key] = []
+                    jobs.append(job)
+
+                owners[key].append(i)
+
+        timeouts = [a.timeout for a in args_list if not a.timeout is None]
+        timeout = max(timeouts) if len(timeouts) > 0 else None
+        verbose = any([a.verbose for a in args_list])
+
+        results = [{} for _ in args_list]
+
+        for res in fmdt.api.detect_many(jobs, max_workers=max_workers, timeout=timeout, verbose=verbose):
+            if log:
+                print(f"Tried args on video {res.vid_path()}")
+
+            if not res.error is None:
+                fmdt.utils.stderr(f"{res.args.detect_args.cmd()} failed: {res.error}")
+
+            for i in owners[(res.vid_path(), res.args.detect_args.cache_key())]:
+                results[i][res.vid_path()] = res
+
+        return results
+
+    def try_command(self, args: fmdt.args.Args, max_workers: int | None = None) -> list[bool]:
         """Take a set of parameters defined by `args` and apply it to every meteor in this database.
-        
+
+        `fmdt-detect` is executed once per unique video, with up to `max_workers` videos processed
+        at the same time, and every meteor of a video is evaluated against that single tracking list.
+        `args` is not modified: each video gets its own copy of `args.detect_args`.
+
         Return a list of booleans that are true if the corresponding meteor was
         detected. 
         """
-        def try_comm(m: HumanDetection) -> bool:
 
-            args.detect_args.vid_in_path = m.video_name
+        results = self._detect_all([args], max_workers)[0]
 
-            print(f"Trying args on video {args.vid()}")
-            
-            res = args.detect()
+        def try_comm(m: HumanDetection) -> bool:
+
+            res = results[m.video_name]
             is_detected = is_meteor_detected(m, res.trk_list)
+
             if not is_detected:
                 print(f"{res.args.detect_args.cmd()} {colored('unsuccessful', 'red')}")
             else:
@@ -243,8 +295,96 @@ class GroundTruth:
             
             return is_detected
 
-        # return [try_comm(m) for m in self.meteors if os.path.exists(m.video_name)]
         return [try_comm(m) for m in self.meteors]
+
+    def screen(
+            self,
+            candidates: list[fmdt.args.Args],
+            fidelities: list[dict] | None = None,
+            keep: float | list[float] = 0.5,
+            max_workers: int | None = None
+        ):
+        """Rank `candidates` by the number of meteors they detect, promoting only the best ones to full-fidelity runs
+
+        Every candidate is first detected at the lowest fidelity of `fidelities`: each fidelity is a dict of
+        DetectArgs overrides that make a detection cheaper, such as {"vid_in_skip": 3} (process one frame in
+        four) or {"vid_in_stop": 2000} (only the beginning of the videos). After each fidelity only the best
+        `keep` fraction of the candidates is promoted to the next one, and the last survivors are detected
+        without overrides.
+
+        The returned ScreeningReport holds the score of every candidate at every fidelity it reached, and the
+        rank correlation between the screening scores and the final ones, which tells whether a schedule
+        is a good proxy for these videos.
+
+        Parameters
+        ----------
+        candidates (list[fmdt.args.Args]): Configurations to rank
+        fidelities (list[dict]): DetectArgs overrides of each screening stage, cheapest first. Default DEFAULT_FIDELITIES
+        keep (float | list[float]): Fraction of the candidates promoted after each stage. Default 0.5
+        max_workers (int): Maximum number of concurrent `fmdt-detect` processes. Default os.cpu_count()
+
+        Examples
+        --------
+        >>> report = gt6.screen([fmdt.detect_args(ccl_hyst_lo=lo, ccl_hyst_hi=lo + 30) for lo in range(150, 225, 5)],
+        ...                     fidelities=[{"vid_in_skip": 3}, {"vid_in_skip": 1}], keep=0.5)
+        >>> print(report)
+        """
+
+        if fidelities is None:
+            fidelities = DEFAULT_FIDELITIES
+
+        if not isinstance(keep, list):
+            keep = [keep] * len(fidelities)
+
+        assert len(keep) == len(fidelities), "screen needs one `keep` fraction per fidelity"
+
+        stages = fidelities + [{}]
+        scores = [{} for _ in stages]
+        alive = list(range(len(candidates)))
+
+        for (k, overrides) in enumerate(stages):
+
+            stage_args = []
+
+            for i in alive:
+                a = copy.deepcopy(candidates[i])
+
+                if a.detect_args is None:
+                    a.detect_args = fmdt.args.DetectArgs(vid_in_path=None)
+
+                for (name, value) in overrides.items():
+                    setattr(a.detect_args, name, value)
+
+                stage_args.append(a)
+
+            results = self._detect_all(stage_args, max_workers, log=False)
+
+            for (i, res) in zip(alive, results):
+                scores[k][i] = sum([is_meteor_detected(m, res[m.video_name].trk_list) for m in self.meteors])
+
+            if k < len(fidelities):
+                ranked = sorted(alive, key=lambda i: scores[k][i], reverse=True)
+                alive = ranked[0:max(1, math.ceil(keep[k] * len(alive)))]
+
+        return ScreeningReport(candidates, stages, scores, len(self.vids()))
+
+    def screen_span(
+            self,
+            ccl_hyst_lo_min: int,
+            ccl_hyst_lo_max: int,
+            diff: int,
+            fidelities: list[dict] | None = None,
+            keep: float | list[float] = 0.5,
+            timeout: float | None = None,
+            max_workers: int | None = None
+        ):
+        """Screen the [ccl_hyst_lo, ccl_hyst_lo + diff] intervals of test_span (see screen)"""
+
+        n = (ccl_hyst_lo_max - ccl_hyst_lo_min) / diff + 1
+        candidates = [fmdt.args.detect_args(ccl_hyst_lo=int(lmin), ccl_hyst_hi=int(lmin + diff), timeout=timeout)
+                      for lmin in np.linspace(ccl_hyst_lo_min, ccl_hyst_lo_max, int(n))]
+
+        return self.screen(candidates, fidelities, keep, max_workers)
     
     def vids(self) -> list[str]:
         """Return the list of unique videos that appear in this database"""
@@ -286,54 +426,126 @@ class GroundTruth:
 
         return min_max, dets, successes
     
-    def draw_heatmap(self, lmin_min, lmax_max, n_intervals):
+    def hysteresis_bands(
+            self,
+            args: fmdt.args.Args | None = None,
+            width: int = 5,
+            max_workers: int | None = None,
+            **kwargs
+        ) -> list:
+        """Compute the hysteresis_band of every meteor of this database, searching up to `max_workers` meteors at the same time
+
+        The remaining keyword arguments are forwarded to hysteresis_band
+        """
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda m: hysteresis_band(m, args, width=width, **kwargs), self.meteors))
+
+    def draw_heatmap(
+            self,
+            lmin_min,
+            lmax_max,
+            n_intervals,
+            save_path: str | None = None,
+            matrix_path: str | None = None
+        ):
+        """Detect the meteors of this database with `n_intervals` intervals between `lmin_min` and `lmax_max` and plot
+        which meteors each interval detects (see test_span and plot_gt)
+
+        Parameters
+        ----------
+        save_path (str): Write the figure to this file (e.g. 'heatmap.png') instead of showing it. Default None
+        matrix_path (str): Save the intervals and the success matrix to this .npy file, to plot them again with
+            plot_gt(*load_heatmap_matrix(matrix_path)) without detecting anything. Default None
+        """
 
-        successes = []
         diff = (lmax_max - lmin_min) / (n_intervals)
 
         min_max, _, successes = self.test_span(lmin_min, lmax_max - diff, diff)
 
-        plot_gt(min_max, successes)
+        if not matrix_path is None:
+            save_heatmap_matrix(matrix_path, min_max, successes)
+
+        return plot_gt(min_max, successes, save_path)
 
 
 import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
+from matplotlib.figure import Figure
+from matplotlib.colors import ListedColormap
 
-def plot_gt(minmax: list[tuple[float, float]], successes: list[list[bool]]):
+def heatmap_matrix(minmax: list[tuple[float, float]], successes: list[list[bool]]) -> np.ndarray:
+    """Stack the intervals and the successes of test_span into a single (n_intervals, 2 + n_meteors) array
 
-    lmin_min = minmax[0][0]
-    lmin_max = minmax[-1][1]
+    The columns are ccl_hyst_lo, ccl_hyst_hi, then 1.0 for every meteor detected by the interval and 0.0 otherwise.
+    """
 
-    _, ax = plt.subplots()
-    num_gt = len(successes[0])
-    
-    print(f"Num intervals: {len(minmax)}")
+    return np.column_stack([np.asarray(minmax, dtype=float).reshape(-1, 2), np.asarray(successes, dtype=float)])
+
+def save_heatmap_matrix(filename: str, minmax: list[tuple[float, float]], successes: list[list[bool]]) -> None:
+    """Save the result of test_span to a .npy file (see heatmap_matrix)"""
+    np.save(filename, heatmap_matrix(minmax, successes))
+
+def load_heatmap_matrix(filename: str) -> tuple[list[tuple[float, float]], np.ndarray]:
+    """Load a file written by save_heatmap_matrix, as the (minmax, successes) arguments of plot_gt"""
+
+    m = np.load(filename)
+
+    return [(float(lo), float(hi)) for (lo, hi) in m[:, 0:2]], m[:, 2:] > 0.5
+
+def plot_gt(
+        minmax: list[tuple[float, float]],
+        successes: list[list[bool]] | np.ndarray,
+        save_path: str | None = None,
+        show: bool | None = None
+    ) -> Figure:
+    """Draw which meteors (x axis) are detected by each [ccl_hyst_lo, ccl_hyst_hi] interval (y axis) in green
+
+    The success matrix is drawn as a single mesh, so large grids render quickly.
+
+    Parameters
+    ----------
+    minmax (list[tuple[float, float]]): Intervals, sorted by increasing ccl_hyst_lo
+    successes (list[list[bool]] | np.ndarray): successes[i][j] is True when interval i detects meteor j
+    save_path (str): Write the figure to this file. Default None
+    show (bool): Show the figure in a window. Default True when `save_path` is None. Without showing,
+        the figure is rendered without pyplot, so no display is needed
+    """
+
+    if show is None:
+        show = save_path is None
+
+    matrix = np.asarray(successes, dtype=bool)
+    n_intervals, num_gt = matrix.shape
+
+    print(f"Num intervals: {n_intervals}")
     print(f"Num ground truths: {num_gt}")
 
-    y_ticks = []
-
-    for i in range(len(minmax)):
-        lmin = minmax[i][0]
-        lmax = minmax[i][1]
-        y_ticks.append(lmin)
-        h = lmax - lmin
-        w = 1
-        print(f"lmin: {lmin}")
-
-        # Now iterate horizontally
-        for id in range(num_gt):
-            if successes[i][id]:
-                # print("Rect")
-                ax.add_patch(Rectangle((id, lmin), w, h, facecolor = "green"))
-            else:
-                ax.add_patch(Rectangle((id, lmin), w, h, facecolor = "black"))
+    # Interval i spans [lmin_i, lmin_i+1], the last one ends at its ccl_hyst_hi
+    y_edges = np.array([lo for (lo, _) in minmax] + [minmax[-1][1]], dtype=float)
+    x_edges = np.arange(num_gt + 1)
+
+    if show:
+        fig, ax = plt.subplots()
+    else:
+        fig = Figure()
+        ax = fig.subplots()
+
+    ax.pcolormesh(x_edges, y_edges, matrix, cmap=ListedColormap(["black", "green"]), vmin=0, vmax=1)
+
+    ax.set_xlim([0, num_gt])
+    ax.set_ylim([y_edges[0], y_edges[-1]])
+
+    # Past a few dozen intervals, let matplotlib pick readable ticks
+    if len(y_edges) <= 32:
+        ax.set_yticks(y_edges)
+
+    if not save_path is None:
+        fig.savefig(save_path)
 
-    y_ticks.append(lmin_max)
+    if show:
+        plt.show()
 
-    plt.xlim([0, num_gt])
-    plt.ylim([lmin_min, lmin_max])
-    plt.yticks(y_ticks)
-    plt.show()
+    return fig
 
 # for d in range(len(MIN_MAX)):
 #     plot_gt(MIN_MAX[d], SUCCESS[d])
@@ -396,11 +608,9 @@ def is_meteor_detected(meteor: HumanDetection, tracking_list: list[TrackedObject
     if tracking_list is None:
         return False
 
-    # keep only meteors
-    detected_m = [m for m in tracking_list if m.is_meteor()]
-
-    for tracked in detected_m: 
-        if are_objects_the_same(meteor, tracked):
+    # keep only meteors, without building a filtered copy of the list for every ground truth
+    for tracked in tracking_list:
+        if tracked.type == fmdt.core.ObjectType.METEOR and are_objects_the_same(meteor, tracked):
             return True
 
     return False 
@@ -507,6 +717,313 @@ def are_objects_the_same(meteor: HumanDetection, tracked_obj: TrackedObject, log
     return True
         
 
+def meteor_windows(meteors: list[HumanDetection], margin: int = WINDOW_MARGIN) -> list[tuple[int, int]]:
+    """Frame windows (vid_in_start, vid_in_stop) that cover every meteor plus `margin` frames on each side
+
+    Overlapping windows are merged.
+    """
+
+    intervals = sorted([(max(m.start_frame - margin, 0), m.end_frame + margin) for m in meteors])
+    windows = []
+
+    for (start, stop) in intervals:
+
+        if len(windows) > 0 and start <= windows[-1][1]:
+            prev_start, prev_stop = windows.pop()
+            start, stop = prev_start, max(stop, prev_stop)
+
+        windows.append((start, stop))
+
+    return windows
+
+def shift_tracks(
+        trk_list: list[TrackedObject],
+        start: int,
+        numbering: FrameNumbering = DETECT_FRAME_NUMBERING
+    ) -> list[TrackedObject]:
+    """Return copies of the tracks detected in a window starting at frame `start`, numbered like the whole video
+
+    Parameters
+    ----------
+    trk_list (list[TrackedObject]): Tracks of a run of `fmdt-detect` with vid_in_start=start
+    start (int): First frame of the window
+    numbering (FrameNumbering): How `fmdt-detect` numbered the frames of `trk_list`. Tracks numbered
+        from the start of the window (FrameNumbering.WINDOW) are shifted by `start`. Default DETECT_FRAME_NUMBERING
+    """
+
+    offset = start if numbering == FrameNumbering.WINDOW else 0
+    shifted = []
+
+    for t in trk_list:
+        t_c = copy.copy(t)
+        t_c.start_frame = t.start_frame + offset
+        t_c.end_frame = t.end_frame + offset
+        shifted.append(t_c)
+
+    return shifted
+
+def _spearman(x: list[float], y: list[float]) -> float:
+    """Rank correlation of two lists of scores, NaN when it isn't defined"""
+
+    if len(x) < 2:
+        return float("nan")
+
+    rx = pd.Series(x).rank().to_numpy()
+    ry = pd.Series(y).rank().to_numpy()
+
+    if rx.std() == 0 or ry.std() == 0:
+        return float("nan")
+
+    return float(np.corrcoef(rx, ry)[0, 1])
+
+class ScreeningReport:
+    """Scores of the candidates of GroundTruth.screen at every fidelity they reached"""
+
+    def __init__(self, candidates: list[fmdt.args.Args], stages: list[dict], scores: list[dict], n_videos: int):
+
+        self.candidates = candidates
+        self.stages = stages
+        self.scores = scores
+        self.n_videos = n_videos
+
+    def stage_names(self) -> list[str]:
+        return [", ".join([f"{k}={v}" for (k, v) in s.items()]) if len(s) > 0 else "full" for s in self.stages]
+
+    def to_df(self) -> pd.DataFrame:
+        """One row per candidate, one column per stage with the number of meteors detected (NaN when not reached)"""
+
+        df = pd.DataFrame({name: pd.Series(self.scores[k], dtype=float) for (k, name) in enumerate(self.stage_names())},
+                          index=range(len(self.candidates)))
+        df.index.name = "candidate"
+
+        return df
+
+    def correlations(self) -> dict[str, float]:
+        """Spearman correlation between the score of each screening stage and the final score
+
+        Only the candidates that reached the final stage are compared, so a schedule that promotes few
+        candidates gives a noisy estimate.
+        """
+
+        final = self.scores[-1]
+        out = {}
+
+        for (k, name) in enumerate(self.stage_names()[0:-1]):
+            common = [i for i in final.keys() if i in self.scores[k]]
+            out[name] = _spearman([self.scores[k][i] for i in common], [final[i] for i in common])
+
+        return out
+
+    def best(self) -> fmdt.args.Args:
+        """Candidate that detects the most meteors at full fidelity"""
+
+        final = self.scores[-1]
+        return self.candidates[max(final.keys(), key=lambda i: final[i])]
+
+    def n_runs(self) -> int:
+        """Number of (candidate, video) detections of the screening"""
+        return sum([len(s) for s in self.scores]) * self.n_videos
+
+    def __str__(self) -> str:
+
+        s = f"Screening of {len(self.candidates)} candidate(s) on {self.n_videos} video(s)\n"
+        s += "    candidates per stage: " + " -> ".join([f"{len(sc)} ({name})" for (sc, name) in zip(self.scores, self.stage_names())]) + "\n"
+
+        for (name, r) in self.correlations().items():
+            s += f"    correlation of '{name}' with the final scores: {r:.2f} ({len(self.scores[-1])} candidate(s))\n"
+
+        s += str(self.to_df())
+
+        return s
+
+class HysteresisBand:
+    """Range [lo_min, lo_max] of `ccl_hyst_lo` values that detect a meteor, `ccl_hyst_hi` being
+    `ccl_hyst_lo + width` (capped at 255)
+
+    An empty band (lo_min and lo_max set to None) means that no probe detected the meteor.
+    """
+
+    def __init__(
+            self,
+            meteor: HumanDetection,
+            lo_min: int | None,
+            lo_max: int | None,
+            width: int,
+            n_runs: int,
+            verified: bool
+        ):
+
+        self.meteor = meteor
+        self.lo_min = lo_min
+        self.lo_max = lo_max
+        self.width = width
+        self.n_runs = n_runs
+        self.verified = verified
+
+    def is_empty(self) -> bool:
+        return self.lo_min is None
+
+    def hi_max(self) -> int | None:
+        """Highest `ccl_hyst_hi` of the band"""
+
+        if self.is_empty():
+            return None
+
+        return min(self.lo_max + self.width, 255)
+
+    def __str__(self) -> str:
+
+        if self.is_empty():
+            band = "no band found"
+        else:
+            band = f"ccl_hyst_lo in [{self.lo_min}, {self.lo_max}], ccl_hyst_hi = ccl_hyst_lo + {self.width}"
+
+        check = "" if self.verified else ", " + colored("not verified", "red")
+
+        return f"{self.meteor}: {band} ({self.n_runs} runs{check})"
+
+def _probe_order(low: int, high: int, tol: int) -> list[int]:
+    """Points of [low, high] in coarse-to-fine order: the middle, then the quarters, the eighths..."""
+
+    probes = []
+    n = 2
+
+    while (high - low) / n >= tol:
+        for k in range(1, n, 2):
+            probes.append(low + (high - low) * k // n)
+
+        n *= 2
+
+    return probes
+
+def hysteresis_band(
+        meteor: HumanDetection,
+        args: fmdt.args.Args | None = None,
+        vid_in_path: str | None = None,
+        width: int = 5,
+        low: int = 0,
+        high: int = 250,
+        tol: int = 5,
+        hint: int | None = None,
+        n_verify: int = 2,
+        margin: int | None = WINDOW_MARGIN,
+        verbose: bool = False
+    ) -> HysteresisBand:
+    """Find the `ccl_hyst_lo` values in [low, high] that detect `meteor`, with `ccl_hyst_hi = ccl_hyst_lo + width`
+
+    Instead of scanning every threshold, this relies on detection succeeding on a single band of
+    thresholds: too low and the meteor drowns in noise, too high and it isn't bright enough. A first
+    detecting threshold is found by probing `hint`, then the middle of [low, high], then its quarters,
+    and so on. The edges of the band are then located by bisection, to within `tol`. Finally
+    `n_verify` thresholds inside the band are detected to check the assumption; when one of them
+    misses the meteor, the band is reported as not verified.
+
+    Parameters
+    ----------
+    meteor (HumanDetection): Meteor to detect
+    args (fmdt.args.Args): Parameters of fmdt-detect other than the thresholds. Default fmdt-detect's defaults
+    vid_in_path (str): Path of the video of `meteor`. Default meteor.video_name
+    width (int): ccl_hyst_hi - ccl_hyst_lo. Default 5
+    low, high (int): Range of ccl_hyst_lo searched. Default [0, 250]
+    tol (int): Precision of the edges of the band. Default 5
+    hint (int): ccl_hyst_lo tried first, for instance the one of a best detection. Default None
+    n_verify (int): Number of thresholds inside the band detected to verify it. Default 2
+    margin (int): Only detect the frames of the meteor plus `margin` frames on each side (see meteor_windows).
+        None detects the whole video. Default WINDOW_MARGIN
+
+    Return
+    ------
+    A HysteresisBand. `n_runs` is the number of detections that were needed
+
+    Examples
+    --------
+    >>> m = fmdt.load_draco6(require_gt=True)[0].meteors()[0]
+    >>> band = fmdt.truth.hysteresis_band(m, vid_in_path=fmdt.load_draco6(require_gt=True)[0].full_path(), width=30)
+    >>> print(band)
+    """
+
+    assert tol >= 1, "hysteresis_band needs tol >= 1"
+
+    if args is None or args.detect_args is None:
+        template = fmdt.args.DetectArgs(vid_in_path=None)
+        timeout = None if args is None else args.timeout
+    else:
+        template = args.detect_args
+        timeout = args.timeout
+
+    if vid_in_path is None:
+        vid_in_path = meteor.video_name
+
+    if margin is None:
+        start, stop = None, None
+    else:
+        start, stop = meteor_windows([meteor], margin)[0]
+
+    # ccl_hyst_lo -> is the meteor detected
+    detected = {}
+
+    with tempfile.TemporaryDirectory(prefix="fmdt_band_") as work_dir:
+
+        def detects(lo: int) -> bool:
+
+            if lo in detected:
+                return detected[lo]
+
+            d_args = copy.deepcopy(template)
+            d_args.vid_in_path = vid_in_path
+            d_args.vid_in_start = start
+            d_args.vid_in_stop = stop
+            d_args.ccl_hyst_lo = lo
+            d_args.ccl_hyst_hi = min(lo + width, 255)
+            d_args.log_path = None
+            d_args.trk_path = fmdt.utils.join(work_dir, f"{lo}_trk.txt")
+            d_args.trk_roi_path = fmdt.utils.join(work_dir, f"{lo}_trk2roi.txt")
+
+            res = d_args.exec(timeout=timeout)
+            trk_list = res.trk_list if margin is None else shift_tracks(res.trk_list, start)
+
+            detected[lo] = res.ok() and is_meteor_detected(meteor, trk_list)
+
+            if verbose:
+                print(f"[{lo}, {d_args.ccl_hyst_hi}] {colored('successful', 'green') if detected[lo] else colored('unsuccessful', 'red')}")
+
+            return detected[lo]
+
+        probes = _probe_order(low, high, tol)
+
+        if not hint is None:
+            probes = [hint] + probes
+
+        seed = next((lo for lo in probes if detects(lo)), None)
+
+        if seed is None:
+            return HysteresisBand(meteor, None, None, width, len(detected), False)
+
+        def edge(good: int, bad: int) -> int:
+            """Bisect between a detecting threshold and a missing one (or one just outside of the range)"""
+
+            while abs(good - bad) > tol:
+                mid = (good + bad) // 2
+
+                if detects(mid):
+                    good = mid
+                else:
+                    bad = mid
+
+            return good
+
+        # The closest probes that missed the meteor on each side bound the first bisection steps
+        below = max([lo for (lo, d) in detected.items() if not d and lo < seed], default=low - 1)
+        above = min([lo for (lo, d) in detected.items() if not d and lo > seed], default=high + 1)
+
+        lo_min = edge(seed, below)
+        lo_max = edge(seed, above)
+
+        inside = [lo_min + (lo_max - lo_min) * (k + 1) // (n_verify + 1) for k in range(n_verify)]
+        verified = all([detects(lo) for lo in inside])
+
+    return HysteresisBand(meteor, lo_min, lo_max, width, len(detected), verified)
+
 def vary_light_intervals(
         vid: str,
         truth: HumanDetection,
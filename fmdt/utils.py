@@ -3,6 +3,7 @@ import os
 import sys
 import numpy as np
 import subprocess
+import hashlib
 
 from termcolor import (
     colored
@@ -90,6 +91,12 @@ def get_video_duration(filename: str) -> float:
     video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
     return float(video_stream['duration'])
 
+def get_video_shape(filename: str) -> tuple[int, int, int]:
+    """Get the (width, height, nb_frames) of a video with a single call to ffprobe"""
+    probe = ffmpeg.probe(filename)
+    video_stream = next((stream for stream in probe['streams'] if stream['codec_type'] == 'video'), None)
+    return int(video_stream['width']), int(video_stream['height']), int(video_stream['nb_frames'])
+
 def video_has_cfr(filename: str) -> bool:
     """Check whether a video is encoded with a constant frame rate (CFR)
 
@@ -97,6 +104,42 @@ def video_has_cfr(filename: str) -> bool:
     return get_avg_frame_rate(filename) == get_nominal_frame_rate(filename)
 
 
+# (abspath, size, mtime_ns) -> fingerprint, so that a video is only sampled once per modification
+_FINGERPRINTS = {}
+
+_FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+def video_fingerprint(filename: str) -> str:
+    """Compute a cheap fingerprint of the content of a video file
+
+    The fingerprint is an md5 hash of the file size and of three blocks sampled at the beginning,
+    middle and end of the file. Two copies of the same video have the same fingerprint regardless of
+    their names, while a video replaced under the same name gets a new one. Results are memoized on
+    (path, size, mtime) so repeated calls don't touch the file content.
+    """
+    assert_file_exists(filename)
+
+    stat = os.stat(filename)
+    memo_key = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+
+    if memo_key in _FINGERPRINTS:
+        return _FINGERPRINTS[memo_key]
+
+    size = stat.st_size
+    offsets = [0, max(size // 2 - _FINGERPRINT_BLOCK_SIZE // 2, 0), max(size - _FINGERPRINT_BLOCK_SIZE, 0)]
+
+    md5 = hashlib.md5(str(size).encode())
+
+    with open(filename, "rb") as file:
+        for off in offsets:
+            file.seek(off)
+            md5.update(file.read(_FINGERPRINT_BLOCK_SIZE))
+
+    fingerprint = md5.hexdigest()
+    _FINGERPRINTS[memo_key] = fingerprint
+
+    return fingerprint
+
 def decompose_video_filename(filename: str) -> tuple[str, str]:
     """Separate the name of a video from its extension
 
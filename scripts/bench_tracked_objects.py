@@ -0,0 +1,68 @@
+"""Micro-benchmark of the memory used by TrackedObjects and of the time spent matching them
+
+Writes a tracks file of 100k tracks, loads it as a list of TrackedObject and reports
+    - the memory held by the list (tracemalloc), next to the size of the same tracks in a TrackTable
+    - the time to compute the derived quantities (direction, slope, dx) of every track
+    - the time to match a set of HumanDetections against the tracks (fmdt.truth.is_meteor_detected)
+
+Usage: python bench_tracked_objects.py [n_tracks] [n_meteors]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+import tracemalloc
+import fmdt.core
+import fmdt.truth
+
+n_tracks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+n_meteors = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+random.seed(0)
+
+def random_track(id: int) -> fmdt.core.TrackedObject:
+    f0 = random.randrange(0, 100_000)
+    x0, y0 = random.uniform(0, 1920), random.uniform(0, 1080)
+
+    return fmdt.core.TrackedObject(id, f0, x0, y0, f0 + random.randrange(1, 30),
+                                   x0 + random.uniform(-50, 50), y0 + random.uniform(-50, 50),
+                                   fmdt.core.ObjectType(random.randrange(0, 3)))
+
+with tempfile.TemporaryDirectory() as tmp:
+    trk_path = os.path.join(tmp, "tracks.txt")
+    fmdt.core.write_tracks_file(trk_path, [random_track(i + 1) for i in range(n_tracks)])
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trk_list = fmdt.core.read_tracks_file(trk_path)
+    t_load = time.perf_counter() - start
+    mem, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    table_bytes = fmdt.core.read_track_table(trk_path).data.nbytes
+
+start = time.perf_counter()
+
+for _ in range(10):
+    for t in trk_list:
+        t.direction()
+        t.slope()
+        t.dx()
+
+t_derived = (time.perf_counter() - start) / 10
+
+# Ground truths taken from the meteors of the file, so that some of the pairs go through every test
+meteors = [t for t in trk_list if t.is_meteor()][0:n_meteors]
+truths = [fmdt.truth.HumanDetection("bench.mp4", m.start_frame, m.end_frame, m.start_x, m.start_y, m.end_x, m.end_y) for m in meteors]
+
+start = time.perf_counter()
+n_detected = sum(fmdt.truth.is_meteor_detected(h, trk_list) for h in truths)
+t_match = time.perf_counter() - start
+
+print(f"{len(trk_list)} tracks, {len(truths)} ground truths ({n_detected} detected)")
+print(f"    load:            {t_load:.3f}s")
+print(f"    memory:          {mem / 1024**2:.1f}MB ({mem / len(trk_list):.0f} bytes per track)")
+print(f"    as a TrackTable: {table_bytes / 1024**2:.1f}MB ({table_bytes / len(trk_list):.0f} bytes per track)")
+print(f"    derived values:  {t_derived:.3f}s per pass")
+print(f"    matching:        {t_match:.3f}s")